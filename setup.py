@@ -23,6 +23,8 @@ setup(
         'console_scripts': [
             'simcharts = simcharts.launch_simcharts:main',
             'local_traffic_node = simcharts.launch_local_traffic_node:main',
+            'build_charts = simcharts.launch_build_charts:main',
+            'build_tiles = simcharts.launch_build_tiles:main',
             'dev_test = simcharts.devTest:main'
         ],
     },
@@ -261,6 +261,47 @@ class Display:
 
     # def draw_init_traj_pose(self, pose):
 
+    def restyle(self, settings: dict, changes) -> None:
+        """Applies changed 'display' settings to the open window, except the
+        dpi and resolution, which take effect on the next start."""
+        options = settings['display']
+        if 'draw_names' in changes:
+            self.draw_names = options['draw_names']
+        if 'anchor' in changes:
+            self.anchor_index = self._init_anchor_index(settings)
+            if not self._fullscreen_mode:
+                self.set_figure_position()
+        if 'fullscreen_mode' in changes:
+            self.toggle_fullscreen(options['fullscreen_mode'])
+        if 'colorbar_mode' in changes:
+            self.toggle_colorbar(options['colorbar_mode'])
+        if 'dark_mode' in changes:
+            self.toggle_dark_mode(options['dark_mode'])
+
+    def reload_layers(self, settings: dict) -> None:
+        """Redraws the chart layers, extent and colorbar after the environment
+        has reloaded them."""
+        self.crs = UTM(settings['enc']['utm_zone'])
+        x_min, y_min, x_max, y_max = self.environment.scope.extent.bbox
+        self.axes.set_extent((x_min, x_max, y_min, y_max), crs=self.crs)
+        axes = self._colorbar.ax
+        axes.clear()
+        self._colorbar = colorbar(axes, self.environment.scope.depths)
+        self._colorbar.ax.set_facecolor(self.figure.get_facecolor())
+        self.features.reload_layers()
+        if self._dark_mode:
+            self.features.toggle_topography_visibility(False)
+        self.draw_plot()
+
+    def update_depths(self) -> None:
+        """Redraws the chart layers once more depths have been loaded, with
+        lazily loaded depth layers."""
+        if self.environment.hydrography.loaded_depths == self.features.depths:
+            return
+        self.features.reload_layers()
+        if self._dark_mode:
+            self.features.toggle_topography_visibility(False)
+        self.draw_plot()
 
     def toggle_dark_mode(self, state=None):
         state = state if state is not None else not self._dark_mode
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import numpy as np
+import shapely
 import matplotlib as mpl
 from matplotlib.textpath import TextPath
 from matplotlib.patches import PathPatch
@@ -27,6 +28,7 @@ class FeaturesManager:
         self._hazards = {}
         self._arrows = {}
         self._seabeds = {}
+        self.depths = []
         self.inputted_paths = {}
         self.inputted_trajectories = {}
         self.shadow_ships = {}
@@ -42,6 +44,7 @@ class FeaturesManager:
 
         self._land = None
         self._shore = None
+        self._border = None
         self._init_layers()
 
     @property
@@ -76,7 +79,9 @@ class FeaturesManager:
         ]
 
     def _init_layers(self):
-        layers = self._display.environment.hydrography.loaded_layers
+        hydrography = self._display.environment.hydrography
+        self.depths = hydrography.loaded_depths
+        layers = hydrography.loaded_layers
         for i, layer in enumerate(layers):
             rank = layer.z_order + i
             bins = len(self._display.environment.scope.depths)
@@ -95,7 +100,16 @@ class FeaturesManager:
             geometry = spl.Rectangle(*center, width=size[0] / 2, heading=0,
                                      height=size[1] / 2).geometry
             color = (color_picker('black')[0], 'none')
-            self.new_artist(geometry, color, 10000, linewidth=3)
+            self._border = self.new_artist(geometry, color, 10000,
+                                           linewidth=3)
+
+    def reload_layers(self):
+        for artist in [*self._seabeds.values(), self._shore, self._land,
+                       self._border]:
+            if artist is not None:
+                artist.remove()
+        self._seabeds, self._border = {}, None
+        self._init_layers()
 
     def new_artist(self, geometry, color, z_order=None, **kwargs):
         kwargs['crs'] = self._display.crs
@@ -236,7 +250,7 @@ class FeaturesManager:
                     [v['ship'].horizon for v in self._vessels.values()]
                 )
                 if safe_area is not None:
-                    static = geometry.difference(safe_area.geometry)
+                    static = safe_area.parts.subtract_from(geometry)
                     dynamic = geometry.intersection(vessel_horizons)
                     if not (static.is_empty and dynamic.is_empty):
                         self._hazards[color] = self.new_artist(
@@ -265,13 +279,14 @@ class FeaturesManager:
 
     @staticmethod
     def closest(ownship, hazards):
-        if not spl.Shape.is_multi(hazards):
-            hazards = spl.Shape.as_multi(hazards)
-        lines = []
-        for polygon in list(hazards):
-            near = ownship.closest_points(polygon.exterior)
-            lines.append(spl.Shape.line_between(near, ownship.center))
-        shortest = sorted(lines, key=lambda x: x.length)[0]
+        parts = shapely.get_parts(hazards)
+        parts = parts[shapely.get_type_id(parts) == shapely.GeometryType.POLYGON]
+        exteriors = shapely.get_exterior_ring(parts)
+        near = shapely.get_point(
+            shapely.shortest_line(ownship.geometry, exteriors), 1
+        )
+        nearest = near[np.argmin(shapely.distance(near, ownship.center))]
+        shortest = spl.Shape.line_between(nearest, ownship.center)
         interpolated = shortest.interpolate(
             min(ownship.dimensions[1] * 0.8, shortest.length * 0.3))
         head, base = shortest.coords[0], interpolated.coords[0]
@@ -1,18 +1,27 @@
-from typing import Any, List, Tuple, Union
+from typing import TYPE_CHECKING, Any, List, Tuple, Union
 import rclpy
 from rclpy.node import Node
 import datetime
-import matplotlib
+import threading
+import time
 import numpy as np
-import simcharts.display as dis
 import simcharts.environment as env
-from cartopy.crs import UTM
 from simcharts.utils.helper import *
-from simcharts.display.colors import get_random_color_name
 from simcharts.nodes import LocalTrafficSubscriber
 from simcharts_interfaces.msg import Point, Polygon, Path, Trajectory
 from simcharts_interfaces.srv import GetDynamicObstacles, GetStaticObstacles, GetUserDrawnSet, DrawPath, DrawTrajectory
 from simcharts_interfaces.srv import AddVesselToLocalTraffic, CleanPlot, RemoveVesselFromLocalTraffic, DrawObstacleOverlay
+try:
+    from simcharts_interfaces.srv import ClassifyPoints
+except ImportError:  # Interfaces built before the batched chart queries
+    ClassifyPoints = None
+try:
+    from simcharts_interfaces.srv import ValidatePaths
+except ImportError:  # Interfaces built before the batched path validation
+    ValidatePaths = None
+
+if TYPE_CHECKING:
+    from cartopy.crs import UTM
 
 
 class ENC(Node):
@@ -38,11 +47,41 @@ class ENC(Node):
         :param new_data: bool indicating if new files should be parsed
         :param border: bool for showing a border around the environment plot
         :param verbose: bool for status printing during geometry processing
+        :param workers: int of worker processes for parsing new data
+        :param lazy_depths: bool for loading depth layers on first access
+        :param prefetch_depths: bool for loading lazy depths in background
+        :param depth_bands: bool for holding depths as disjoint depth bands
+        :param memory_limit: int of soft memory ceiling in MB for merging
+        :param cell_size: int of grid cell width in meters for processing
+        :param incremental: bool for updating layers from changed features
+        :param profile: bool for writing a JSON report of ingestion costs
+        :param cache_format: str of processed layer storage format
+        :param cache_compression: str of compression codec for cached layers
+        :param cache_budget: int of disk space in MB for cached layers
+        :param tiles: bool for assembling layers from a pre-built tile pyramid
+        :param tile_size: int of tile width and height in meters
+        :param tile_levels: list(float...) of tolerances built for each tile
+        :param snapshot: bool for restoring the loaded chart from a snapshot
+        :param compact_coordinates: bool for float32 origin-relative storage
+        :param raster_resolution: float of chart raster cell width in meters
+        :param raster_depth: int of depth bounding the raster distance field
+        :param progressive_startup: bool for serving before charts are loaded
+        :param startup_timeout: float of seconds services wait for charts
+        :param hot_reload: bool for applying configuration file changes live
+        :param reload_interval: float of seconds between file change checks
+        :param path_warnings: bool for warning about drawn paths off water
+        :param path_draft: float of vessel draft drawn paths are checked for
+        :param path_clearance: float of distance drawn paths keep from hazards
     """
+    # Settings of the node itself, which need no charts to be recomputed.
+    _NODE_SETTINGS = {
+        'sim_callback_time', 'progressive_startup', 'startup_timeout',
+        'hot_reload', 'reload_interval', 'path_warnings', 'path_draft',
+        'path_clearance',
+    }
 
     def __init__(self, config, executor=None, cli_args=None, multiprocessing=False, **kwargs):
         super().__init__('simcharts__node', cli_args=cli_args)
-        matplotlib.use("TkAgg")
 
         self._CLK = 0 # Simulation time
         
@@ -58,12 +97,23 @@ class ENC(Node):
         self.executor = executor
         self._cfg = config
         self.sim_callback_time = self._cfg.settings['enc']['sim_callback_time']
-        
-        self._environment = env.Environment(self._cfg.settings)
-        self.land = self._environment.topography.land
-        self.shore = self._environment.topography.shore
-        self.seabed = self._environment.hydrography.bathymetry
-        self._display = dis.Display(self._cfg.settings, self._environment, self)
+        self.progressive_startup = self._cfg.settings['enc']['progressive_startup']
+        self.startup_timeout = self._cfg.settings['enc']['startup_timeout']
+        self.hot_reload = self._cfg.settings['enc']['hot_reload']
+        self.reload_interval = self._cfg.settings['enc']['reload_interval']
+        self.path_warnings = self._cfg.settings['enc']['path_warnings']
+        self.path_draft = self._cfg.settings['enc']['path_draft']
+        self.path_clearance = self._cfg.settings['enc']['path_clearance']
+        self._reload_check = 0.0
+        self._reloader = None
+        self._reloaded = None
+
+        self._environment = env.Environment(
+            self._cfg.settings, defer=self.progressive_startup
+        )
+        self._display = None
+        if not self.progressive_startup:
+            self._create_display()
 
         # ROS communication
         self.local_traffic_subscriber = LocalTrafficSubscriber()
@@ -77,6 +127,54 @@ class ENC(Node):
         self.add_ship_srv = self.create_service(AddVesselToLocalTraffic, 'simcharts__add_vessel', self._add_vessel_callback, callback_group=self.srv_callback_group)
         self.remove_ship_srv = self.create_service(RemoveVesselFromLocalTraffic, 'simcharts__remove_vessel', self._remove_vessel_callback, callback_group=self.srv_callback_group)
         self.clean_plot_srv = self.create_service(CleanPlot, 'simcharts__clean_plot', self._clean_plot_callback, callback_group=self.srv_callback_group)
+        if ClassifyPoints is not None:
+            self.classify_points_srv = self.create_service(
+                ClassifyPoints, 'simcharts__classify_points',
+                self._classify_points_callback,
+                callback_group=self.srv_callback_group,
+            )
+        else:
+            self.get_logger().warning(
+                "simcharts_interfaces has no ClassifyPoints service, "
+                "simcharts__classify_points is not available"
+            )
+        if ValidatePaths is not None:
+            self.validate_paths_srv = self.create_service(
+                ValidatePaths, 'simcharts__validate_paths',
+                self._validate_paths_callback,
+                callback_group=self.srv_callback_group,
+            )
+        else:
+            self.get_logger().warning(
+                "simcharts_interfaces has no ValidatePaths service, "
+                "simcharts__validate_paths is not available"
+            )
+
+        if self.progressive_startup:
+            self._loader = threading.Thread(target=self._load_environment, daemon=True)
+            self._loader.start()
+
+    @property
+    def land(self):
+        topography = self._environment.topography
+        return None if topography is None else topography.land
+
+    @property
+    def shore(self):
+        topography = self._environment.topography
+        return None if topography is None else topography.shore
+
+    @property
+    def seabed(self):
+        hydrography = self._environment.hydrography
+        return None if hydrography is None else hydrography.bathymetry
+
+    @property
+    def loaded(self) -> bool:
+        """
+        :return: bool telling whether every chart layer has been loaded
+        """
+        return self._environment.loaded
 
     @property
     def bbox(self) -> Tuple[int, int, int, int]:
@@ -86,8 +184,11 @@ class ENC(Node):
         return self._environment.scope.extent.bbox
 
     @property
-    def crs(self) -> UTM:
+    def crs(self) -> 'UTM':
         """Return the coordinate reference system projection used, as UTM object."""
+        if self._display is None:
+            from cartopy.crs import UTM
+            return UTM(self._cfg.settings['enc']['utm_zone'])
         return self._display.crs
 
     @property
@@ -129,6 +230,12 @@ class ENC(Node):
         """
         self.executor = executor
         self.executor.add_node(self)
+        if self._display is None:
+            while not self._environment.loaded:
+                if self._environment.error is not None:
+                    raise self._environment.error
+                rclpy.spin_once(self, executor=self.executor, timeout_sec=0.05)
+            self._create_display()
         self.get_logger().debug("Simulation started")
         t_start = datetime.datetime.now().timestamp()
         t_i = datetime.datetime.now().timestamp()
@@ -138,6 +245,10 @@ class ENC(Node):
         self._display.update_plot()
         while True:
             rclpy.spin_once(self, executor=self.executor, timeout_sec=0.01)
+            if self.hot_reload:
+                self._apply_config_changes()
+            if self._environment.scope.lazy_depths:
+                self._display.update_depths()
             self.draw_paths()
             self.update_trajectories()
             self.update_polygons()
@@ -165,14 +276,14 @@ class ENC(Node):
         :param arg: boolean switching fullscreen mode on or off
         :return: None
         """
-        self._display.toggle_fullscreen(arg)
+        self._ensure_display().toggle_fullscreen(arg)
 
     def colorbar(self, arg: bool = True) -> None:
         """
         Enable or disable the colorbar legend of environment figure.
         :param arg: boolean switching the colorbar on or off.
         """
-        self._display.toggle_colorbar(arg)
+        self._ensure_display().toggle_colorbar(arg)
 
     def dark_mode(self, arg: bool = True) -> None:
         """
@@ -180,7 +291,7 @@ class ENC(Node):
         :param arg: boolean switching dark mode on or off
         :return: None
         """
-        self._display.toggle_dark_mode(arg)
+        self._ensure_display().toggle_dark_mode(arg)
 
     def add_vessels(self, *args: Tuple[int, int, int, int, str]) -> None:
         """
@@ -188,14 +299,14 @@ class ENC(Node):
         :param args: tuples with id, easting, northing, heading, color
         :return: None
         """
-        self._display.refresh_vessels_from_file(list(args))
+        self._ensure_display().refresh_vessels_from_file(list(args))
 
     def clear_vessels(self) -> None:
         """
         Remove all vessel features from the environment plot.
         :return: None
         """
-        self._display.refresh_vessels_from_file([])
+        self._ensure_display().refresh_vessels_from_file([])
 
     def add_ownship(
         self,
@@ -217,7 +328,7 @@ class ENC(Node):
         :return: None
         """
         self._environment.create_ownship(easting, northing, heading, hull_scale, lon_scale, lat_scale)
-        self._display.update_plot()
+        self._ensure_display().update_plot()
 
     def remove_ownship(self) -> None:
         """
@@ -233,6 +344,7 @@ class ENC(Node):
         :param buffer: optional int denoting the buffer distance
         :return: None
         """
+        self._wait_for_charts()
         self._environment.filter_hazardous_areas(depth, buffer)
 
     def update_local_traffic(self):
@@ -301,7 +413,9 @@ class ENC(Node):
         :param head_size: float of head size (length) in meters
         :return: None
         """
-        self._display.features.add_arrow(start, end, color, width, head_size, thickness, edge_style)
+        self._ensure_display().features.add_arrow(
+            start, end, color, width, head_size, thickness, edge_style
+        )
 
     def draw_circle(
         self,
@@ -322,7 +436,9 @@ class ENC(Node):
         :param edge_style: str or tuple denoting the Matplotlib linestyle
         :return: None
         """
-        self._display.features.add_circle(center, radius, color, fill, thickness, edge_style)
+        self._ensure_display().features.add_circle(
+            center, radius, color, fill, thickness, edge_style
+        )
 
     def draw_line(
         self,
@@ -341,7 +457,7 @@ class ENC(Node):
         :param edge_style: str or tuple denoting the Matplotlib linestyle
         :return: None
         """
-        self._display.features.add_line(points, color, width, thickness, edge_style)
+        self._ensure_display().features.add_line(points, color, width, thickness, edge_style)
 
     def draw_polygon(
         self,
@@ -362,10 +478,11 @@ class ENC(Node):
         :param edge_style: str or tuple denoting the Matplotlib linestyle
         :return: None
         """
-        artist, _ = self._display.features.add_polygon(geometry, color, interiors, fill, thickness, edge_style)
-        id = len(self._display.features.polygons)
-        self._display.features.polygons[f"polygon_nr_{id}"] = {}
-        self._display.features.polygons[f"polygon_nr_{id}"]["artist"] = artist
+        features = self._ensure_display().features
+        artist, _ = features.add_polygon(geometry, color, interiors, fill, thickness, edge_style)
+        id = len(features.polygons)
+        features.polygons[f"polygon_nr_{id}"] = {}
+        features.polygons[f"polygon_nr_{id}"]["artist"] = artist
 
     def draw_rectangle(
         self,
@@ -388,25 +505,28 @@ class ENC(Node):
         :param edge_style: str or tuple denoting the Matplotlib linestyle
         :return: None
         """
-        self._display.features.add_rectangle(center, size, color, rotation, fill, thickness, edge_style)
+        self._ensure_display().features.add_rectangle(
+            center, size, color, rotation, fill, thickness, edge_style
+        )
 
     def get_display_handle(self):
         """Returns figure and axes handles to the seacharts display."""
-        return self._display.figure, self._display.axes
+        display = self._ensure_display()
+        return display.figure, display.axes
 
     def refresh_display(self) -> None:
         """
         Manually redraw the environment display window.
         :return: None
         """
-        self._display.draw_plot()
+        self._ensure_display().draw_plot()
 
     def close_display(self) -> None:
         """
         Close the environment display window and clear all vessels.
         :return: None
         """
-        self._display.terminate()
+        self._ensure_display().terminate()
         self.clear_vessels()
 
     def save_image(
@@ -422,7 +542,7 @@ class ENC(Node):
         :param extension: optional str of file extension name
         :return: None
         """
-        self._display.save_figure(name, scale, extension)
+        self._ensure_display().save_figure(name, scale, extension)
 
     def _clean_plot(self) -> None:
         """
@@ -440,18 +560,137 @@ class ENC(Node):
         self._display.features.inputted_trajectories = {}
         self._display.features.shadow_ships = {}
 
+    def _create_display(self) -> None:
+        """
+        Create the display, importing Matplotlib and Cartopy on first use.
+        :return: None
+        """
+        import matplotlib
+        matplotlib.use("TkAgg")
+        import simcharts.display as dis
+        self._display = dis.Display(self._cfg.settings, self._environment, self)
+
+    def _wait_for_charts(self) -> None:
+        """
+        Wait until all chart layers are loaded, raising the error of a failed
+        background load.
+        :return: None
+        """
+        for name in ('topography', 'hydrography'):
+            self._environment.wait(name)
+        if self._environment.error is not None:
+            raise self._environment.error
+
+    def _ensure_display(self):
+        """
+        Return the display, creating it once the charts are loaded if called
+        before the simulation is started.
+        :return: Display
+        """
+        if self._display is None:
+            self._wait_for_charts()
+            self._create_display()
+        return self._display
+
+    def _load_environment(self) -> None:
+        """
+        Load the chart layers in the background, land and shore first.
+        :return: None
+        """
+        try:
+            self._environment.load(order=('topography', 'hydrography'))
+            self.get_logger().info("Charts loaded")
+        except Exception as e:
+            self.get_logger().error(f"Loading charts failed: {e!r}")
+
+    def _apply_config_changes(self) -> None:
+        """
+        Reload the configuration file once changed, and apply the new settings.
+        Display settings restyle the window, and chart settings recompute the
+        charts in the background, after which the window is redrawn.
+        :return: None
+        """
+        if self._reloaded is not None:
+            self._display.reload_layers(self._cfg.settings)
+            self._reloaded = None
+        now = time.monotonic()
+        if now < self._reload_check:
+            return
+        self._reload_check = now + self.reload_interval
+        if self._reloader is not None and self._reloader.is_alive():
+            return
+        if not self._cfg.changed():
+            return
+        try:
+            changes = self._cfg.reload()
+        except ValueError as e:
+            self.get_logger().error(str(e))
+            return
+        if not changes:
+            return
+        self.get_logger().info(
+            "Configuration changed: "
+            + ', '.join(f"{k}.{v}" for k in sorted(changes) for v in sorted(changes[k]))
+        )
+        enc = changes.get('enc', set())
+        self.sim_callback_time = self._cfg.settings['enc']['sim_callback_time']
+        self.startup_timeout = self._cfg.settings['enc']['startup_timeout']
+        self.hot_reload = self._cfg.settings['enc']['hot_reload']
+        self.reload_interval = self._cfg.settings['enc']['reload_interval']
+        self.path_warnings = self._cfg.settings['enc']['path_warnings']
+        self.path_draft = self._cfg.settings['enc']['path_draft']
+        self.path_clearance = self._cfg.settings['enc']['path_clearance']
+        if 'display' in changes:
+            try:
+                self._display.restyle(self._cfg.settings, changes['display'])
+            except ValueError as e:
+                self.get_logger().error(f"Restyling the display failed: {e}")
+        if enc - self._NODE_SETTINGS:
+            self._reloader = threading.Thread(
+                target=self._reload_environment, args=(enc,), daemon=True
+            )
+            self._reloader.start()
+
+    def _reload_environment(self, changes) -> None:
+        """
+        Recompute the charts depending on the changed 'enc' settings.
+        :param changes: set of changed 'enc' keys
+        :return: None
+        """
+        try:
+            reloaded = self._environment.reload(self._cfg.settings, changes)
+        except Exception as e:
+            self.get_logger().error(f"Reloading charts failed: {e!r}")
+            return
+        if 'topography' in reloaded:
+            self.static_obstacles = []
+        if reloaded:
+            self.get_logger().info("Reloaded " + ' and '.join(reloaded))
+            self._reloaded = reloaded
+
+    def _charts_ready(self, name: str) -> bool:
+        """
+        Wait up to the startup timeout for the given chart layers to load.
+        :param name: str of 'topography' or 'hydrography'
+        :return: bool telling whether the layers are loaded
+        """
+        if self._environment.wait(name, self.startup_timeout):
+            return True
+        if self._environment.error is not None:
+            self.get_logger().error(f"Loading charts failed, {name} is not available")
+        else:
+            self.get_logger().warning(f"Charts are still loading, {name} is not available yet")
+        return False
 
     def _calc_static_obstacles(self):
         """
         Calculate the static obstacles for the environment.
         """
-        raw_obstacles = self.land.geometry.__geo_interface__['coordinates']
         obstacles = []
-        for _pol in raw_obstacles:
-            pol = _pol[0]
+        for pol in self.land.parts.exteriors():
             polygon = Polygon()
             points = []
-            for p in pol:
+            for p in pol.tolist():
                 point = Point()
                 point.x = p[0]
                 point.y = p[1]
@@ -469,6 +708,11 @@ class ENC(Node):
         """
         self.get_logger().debug("Sending Dynamic Obstacles...")
         obstacles = []
+        if self._display is None:
+            self.get_logger().warning("Display is still loading, no dynamic obstacles yet")
+            response.timestamp = getTimeStamp(self.get_clock())
+            response.dynamic_obstacles = obstacles
+            return response
         self.get_logger().debug(f"\n\n_vessels: {self._display.features._vessels}")
         for vessel in self._display.features._vessels.values():
             self.get_logger().debug(f"B")
@@ -499,12 +743,82 @@ class ENC(Node):
         :return: None
         """
         self.get_logger().debug("Sending Static Obstacles...")
-        if self.static_obstacles == []: self._calc_static_obstacles()
         response.timestamp = getTimeStamp(self.get_clock())
+        if not self._charts_ready('topography'):
+            response.static_obstacles = []
+            return response
+        if self.static_obstacles == []:
+            self._calc_static_obstacles()
         response.static_obstacles = copy.deepcopy(self.static_obstacles)
         self.get_logger().debug("Sent Static Obstacles...")
         return response
 
+    def _classify_points_callback(self, request, response):
+        """
+        Callback function for the classify points service.
+        :param request: .x and .y arrays of point coordinates
+        :return: response with .on_land, .depth_bins and .depths
+        """
+        self.get_logger().debug(f"Classifying {len(request.x)} points...")
+        if not (self._charts_ready('topography') and self._charts_ready('hydrography')):
+            response.on_land, response.depth_bins, response.depths = [], [], []
+            return response
+        points = np.column_stack((np.asarray(request.x), np.asarray(request.y)))
+        query = self._environment.query
+        response.depths = query.depths
+        response.on_land = query.on_land(points).tolist()
+        response.depth_bins = query.depth_bins(points).tolist()
+        return response
+
+    def _validate_paths_callback(self, request, response):
+        """
+        Callback function for the validate paths service.
+        :param request: .paths list of Path msgs, .draft and .clearance
+        :return: response with .valid, .first_violation and .clearance
+        """
+        self.get_logger().debug(f"Validating {len(request.paths)} paths...")
+        if not (self._charts_ready('topography') and self._charts_ready('hydrography')):
+            response.valid, response.first_violation, response.clearance = [], [], []
+            return response
+        paths = [np.column_stack((np.asarray(p.x), np.asarray(p.y))) for p in request.paths]
+        try:
+            valid, first, clearance = self._environment.query.validate_paths(
+                paths, request.draft, request.clearance
+            )
+        except ValueError as e:
+            self.get_logger().error(f"Validating paths failed: {e}")
+            response.valid, response.first_violation, response.clearance = [], [], []
+            return response
+        response.valid = valid.tolist()
+        response.first_violation = first.tolist()
+        response.clearance = clearance.tolist()
+        return response
+
+    def _check_drawn_path(self, kind: str, id, path) -> None:
+        """
+        Warn if a drawn path or trajectory crosses land or water shallower
+        than the configured draft. Paths drawn before the charts are loaded
+        are not checked.
+        :param kind: str of 'Path' or 'Trajectory'
+        :param id: id of the vessel
+        :param path: (K, 3) array of x, y and psi
+        :return: None
+        """
+        if not self.path_warnings or len(path) == 0 or not self._environment.loaded:
+            return
+        try:
+            valid, first, clearance = self._environment.query.validate_paths(
+                [path], self.path_draft, self.path_clearance
+            )
+        except ValueError as e:
+            self.get_logger().warning(f"{kind} of vessel {id} not checked: {e}")
+            return
+        if not valid[0]:
+            self.get_logger().warning(
+                f"{kind} of vessel {id} leaves water {self.path_draft} m deep "
+                f"at segment {first[0]}, {clearance[0]:.1f} m from hazards"
+            )
+
     def _get_user_drawn_set_callback(self, request, response) -> None:
         """
         Callback function for the user drawn set service.
@@ -513,6 +827,9 @@ class ENC(Node):
         """
         self.get_logger().debug("Sending User Drawn Set...")
         response.timestamp = getTimeStamp(self.get_clock())
+        if self._display is None:
+            self.get_logger().warning("Display is still loading, no user drawn set yet")
+            return response
         ext = self._display.features.polygons['main_set']['exterior_points']
         exterior = pointlist_to_polygon(ext)
         int = self._display.features.polygons['main_set']['interior_points']
@@ -525,6 +842,11 @@ class ENC(Node):
         self.get_logger().debug("Sent User Drawn Set...")
         return response
     
+    @staticmethod
+    def _random_color() -> str:
+        from simcharts.display.colors import get_random_color_name
+        return get_random_color_name()
+
     def _draw_path_callback(self, request: Path, response) -> None:
         """
         Callback function for the draw path service.
@@ -535,11 +857,12 @@ class ENC(Node):
         path = np.array([(request.path.x[i], request.path.y[i], request.path.psi[i]) for i in range(len(request.path.x))])
         self.get_logger().debug(f"\n\nPath shape: {path.shape}")
         self.get_logger().debug(f"\n\nPath: {path}")
-        color = get_random_color_name()
+        color = self._random_color()
         buffer = 0.1
         thickness = 2
         edge_style = 'solid'
         nrOfShaows = request.nrofshadows
+        self._check_drawn_path('Path', request.id, path)
         self.draw_paths_queue[request.id] = dict(path=path,
                                                  color=color,
                                                  buffer=buffer,
@@ -557,10 +880,11 @@ class ENC(Node):
         """
         self.get_logger().debug("Drawing Trajectory...")
         trajectory = np.array([(request.trajectory.x[i], request.trajectory.y[i], request.trajectory.psi[i]) for i in range(len(request.trajectory.x))])
-        color = get_random_color_name()
+        color = self._random_color()
         buffer = 0.1
         thickness = 2
         edge_style = 'solid'
+        self._check_drawn_path('Trajectory', request.id, trajectory)
         self.draw_trajectories_queue[request.id] = dict(trajectory=trajectory, time=request.trajectory.t, color=color, buffer=buffer,thickness=thickness, edge_style=edge_style)
         return result
 
@@ -1,23 +1,168 @@
 from __future__ import annotations
 
+import copy
+import threading
+from typing import List
+
 import simcharts.spatial as spl
+import simcharts.utils as utils
 
 from .extent import Extent
 from .scope import Scope
 
+# Settings on which every layer depends, reloaded when any of them changes.
+_LAYER_SETTINGS = {
+    'utm_zone', 'size', 'origin', 'center', 'buffer', 'tolerance', 'layers',
+    'files', 'raw_data', 'tiles', 'tile_size', 'tile_levels',
+    'compact_coordinates',
+}
+# Settings on which only the Seabed layers depend.
+_DEPTH_SETTINGS = {
+    'depths', 'lazy_depths', 'prefetch_depths', 'depth_bands',
+}
+
 
 class Environment:
     supported_layers = ", ".join(spl.supported_layers)
 
-    def __init__(self, settings: dict):
+    def __init__(self, settings: dict, defer: bool = False):
+        """Loads the chart layers of the configured extent.
+
+        With 'defer', only the scope is set up, and the layers are loaded by a
+        later call to 'load', typically from a background thread. Other
+        threads may 'wait' for either group of layers in the meantime. Should
+        the load fail, its exception is kept in 'error', and waiting threads
+        are released.
+        """
         self.supported_crs = "EUREF89 UTM zone " + str(settings["enc"]["utm_zone"])
-        extent = Extent(settings)
-        self.scope = Scope(settings, extent)
-        self.hydrography = spl.Hydrography(self.scope)
-        self.topography = spl.Topography(self.scope)
         self.safe_area = None
         self.ownship = None
         self.depth = None
+        self._hazard_buffer = 0
+        self.hydrography = None
+        self.topography = None
+        self._query = None
+        self._raster = None
+        self.error = None
+        self._ready = {
+            'hydrography': threading.Event(), 'topography': threading.Event()
+        }
+        self._snapshot = self._snapshot_of(settings)
+        if self._snapshot is not None and not settings["enc"]["new_data"]:
+            objects = self._snapshot.load()
+            if objects is not None:
+                self.scope, self.hydrography, self.topography = objects
+                self._snapshot = None
+                for ready in self._ready.values():
+                    ready.set()
+                return
+        extent = Extent(settings)
+        self.scope = Scope(settings, extent)
+        if not defer:
+            self.load()
+
+    @property
+    def loaded(self) -> bool:
+        return self.error is None and all(
+            ready.is_set() for ready in self._ready.values()
+        )
+
+    @property
+    def query(self) -> spl.ChartQuery:
+        """The point query engine over the loaded layers, replaced whenever
+        they are reloaded."""
+        query = self._query
+        if (query is None or query.hydrography is not self.hydrography
+                or query.topography is not self.topography):
+            query = self._query = spl.ChartQuery(
+                self.hydrography, self.topography, self.scope.extent.bbox
+            )
+        return query
+
+    @property
+    def raster(self) -> spl.ChartRaster:
+        """The raster of the loaded layers, read from the cache or built on
+        first use, and again after the layers or raster settings change."""
+        query = self.query
+        raster = self._raster
+        if raster is None or raster.query is not query:
+            raster = self._raster = spl.load_raster(self.scope, query)
+        return raster
+
+    def load(self, order=('hydrography', 'topography')) -> None:
+        """Loads each group of layers in the given order, unless loaded."""
+        try:
+            for name in order:
+                if self._ready[name].is_set():
+                    continue
+                if name == 'hydrography':
+                    self.hydrography = spl.Hydrography(self.scope)
+                else:
+                    self.topography = spl.Topography(self.scope)
+                self._ready[name].set()
+        except Exception as e:
+            self.error = e
+            for ready in self._ready.values():
+                ready.set()
+            raise
+        if self._snapshot is not None and self.loaded:
+            self._snapshot.save((self.scope, self.hydrography, self.topography))
+            self._snapshot = None
+
+    def wait(self, name: str, timeout: float = None) -> bool:
+        """Blocks until the 'hydrography' or 'topography' layers are loaded,
+        their load failed or the timeout in seconds runs out, and tells
+        whether they are loaded."""
+        return (self._ready[name].wait(timeout)
+                and getattr(self, name) is not None)
+
+    def reload(self, settings: dict, changes) -> List[str]:
+        """Applies new settings, given the 'enc' keys that changed.
+
+        Layers are only reloaded when a setting they depend on changed, and
+        only the Seabed layers of new depths when just the depths changed.
+        A new buffer or tolerance is not applied to the loaded geometries,
+        but looked up in the chart cache, where each value is processed once,
+        and a new buffer is applied to the cached unbuffered layers. Cached
+        layers are always reused, regardless of 'new_data'.
+        New layers are loaded alongside the current ones and swapped in at
+        the end, so queries are answered throughout. Returns the names of the
+        reloaded groups of layers.
+        """
+        for name in self._ready:
+            self.wait(name)
+        changes = set(changes)
+        settings = copy.deepcopy(settings)
+        settings['enc']['new_data'] = False
+        scope = Scope(settings, Extent(settings))
+        hydrography, topography = self.hydrography, self.topography
+        reloaded = []
+        if changes & _LAYER_SETTINGS:
+            hydrography = spl.Hydrography(scope)
+            topography = spl.Topography(scope)
+            reloaded = ['hydrography', 'topography']
+        elif changes & _DEPTH_SETTINGS:
+            hydrography = spl.Hydrography(scope, hydrography)
+            reloaded = ['hydrography']
+        self.hydrography, self.topography = hydrography, topography
+        self.scope = scope
+        self._raster = None
+        self.supported_crs = "EUREF89 UTM zone " + str(settings["enc"]["utm_zone"])
+        if 'hydrography' in reloaded and self.depth is not None:
+            if self.depth in scope.depths:
+                self.filter_hazardous_areas(self.depth, self._hazard_buffer)
+            else:
+                self.depth = self.safe_area = None
+        snapshot = self._snapshot_of(settings) if reloaded else None
+        if snapshot is not None:
+            snapshot.save((self.scope, self.hydrography, self.topography))
+        return reloaded
+
+    @staticmethod
+    def _snapshot_of(settings: dict):
+        if not settings["enc"]["snapshot"] or settings["enc"]["lazy_depths"]:
+            return None
+        return utils.snapshot.Snapshot(settings["enc"])
 
     def create_ownship(self, x, y, heading, hull_scale, lon_scale, lat_scale) -> None:
         self.ownship = spl.Ship(
@@ -36,6 +181,8 @@ class Environment:
         self.depth = depth
         if buffer < 0:
             raise ValueError("Buffer should be a positive integer.")
-        self.safe_area = self.hydrography.bathymetry[depth]
+        self._hazard_buffer = buffer
+        # Eroded as a copy, since the query engine shares the loaded layers.
+        self.safe_area = copy.copy(self.hydrography.bathymetry[depth])
         if buffer:
             self.safe_area.erode(buffer)
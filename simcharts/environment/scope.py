@@ -21,19 +21,61 @@ class Scope:
     raw_data: bool = None
     border: bool = None
     verbose: bool = None
+    workers: int = None
+    lazy_depths: bool = None
+    prefetch_depths: bool = None
+    depth_bands: bool = None
+    memory_limit: int = None
+    cell_size: int = None
+    incremental: bool = None
+    profile: bool = None
+    epsg: int = None
+    cache_format: str = None
+    cache_compression: str = None
+    cache_budget: int = None
+    tiles: bool = None
+    tile_size: int = None
+    tile_levels: List[float] = None
+    compact_coordinates: bool = None
+    raster_resolution: float = None
+    raster_depth: int = None
+    pyramid: spl.TilePyramid = field(init=False)
     parser: utils.parser.ShapefileParser = field(init=False)
 
     def __init__(self, settings: dict, extent: Extent):
         self.extent = extent
         self.buffer = settings['enc']['buffer']
         self.tolerance = settings['enc']['tolerance']
-        self.layers = settings['enc']['layers']
-        self.depths = settings['enc']['depths']
-        self.files = settings['enc']['files']
+        self.layers = list(settings['enc']['layers'])
+        self.depths = list(settings['enc']['depths'])
+        self.files = list(settings['enc']['files'])
         self.new_data = settings['enc']['new_data']
         self.raw_data = settings['enc']['raw_data']
         self.border = settings['enc']['border']
         self.verbose = settings['enc']['verbose']
+        self.workers = settings['enc']['workers']
+        self.lazy_depths = settings['enc']['lazy_depths']
+        self.prefetch_depths = settings['enc']['prefetch_depths']
+        self.depth_bands = settings['enc']['depth_bands']
+        self.memory_limit = settings['enc']['memory_limit']
+        self.cell_size = settings['enc']['cell_size']
+        self.incremental = settings['enc']['incremental']
+        self.profile = settings['enc']['profile']
+        self.epsg = 25800 + settings['enc']['utm_zone']
+        self.cache_format = settings['enc']['cache_format']
+        self.cache_compression = settings['enc']['cache_compression']
+        self.cache_budget = settings['enc']['cache_budget']
+        self.tiles = settings['enc']['tiles']
+        self.tile_size = settings['enc']['tile_size']
+        self.tile_levels = settings['enc']['tile_levels']
+        self.compact_coordinates = settings['enc']['compact_coordinates']
+        self.raster_resolution = settings['enc']['raster_resolution']
+        self.raster_depth = settings['enc']['raster_depth']
+
+        if self.tiles and self.raw_data:
+            raise ValueError("Tiled charts require 'raw_data' to be False.")
+        if self.cell_size and self.raw_data:
+            raise ValueError("Grid cells require 'raw_data' to be False.")
 
         utils.files.build_directory_structure()
 
@@ -45,6 +87,19 @@ class Scope:
 
         utils.files.build_directory_structure(self.layers)
 
+        cache = utils.cache.ChartCache(
+            self.extent.bbox, self.files, self.buffer, self.tolerance,
+            self.raw_data, self.cache_budget, self.epsg,
+            self.compact_coordinates, self.cell_size, self.memory_limit,
+            self.workers
+        )
         self.parser = utils.ShapefileParser(
-            self.extent.bbox, self.files, self.verbose
+            self.extent.bbox, self.files, self.verbose, self.epsg,
+            self.cache_format, self.cache_compression, cache,
+            self.compact_coordinates
+        )
+        self.pyramid = spl.TilePyramid(
+            self.files, self.tile_size, self.tile_levels, self.buffer,
+            self.epsg, self.cache_format, self.cache_compression,
+            self.compact_coordinates
         )
@@ -0,0 +1,103 @@
+#!/usr/bin/env conda run -n simcharts_env
+"""Builds the chart caches of several regions offline, without ROS or a display.
+
+Regions are listed in a YAML file, each overriding any 'enc' settings of the
+configuration file, typically its extent, depths and tolerance:
+
+    regions:
+      - name: trondheim
+        origin: [569747.80, 7035179.12]
+        size: [1800.0, 1006.20]
+        depths: [0, 5, 10, 20]
+        tolerance: 2
+
+Run with 'ros2 run simcharts build_charts regions.yaml'.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import simcharts.environment as env
+import simcharts.utils as utils
+
+
+def build_region(config_file, overrides: dict) -> dict:
+    """Loads every layer of one region, processing those not yet cached."""
+    start = time.perf_counter()
+    config = utils.config.SeaChartsConfig(config_file, **overrides)
+    if 'origin' in overrides and 'center' not in overrides:
+        config.settings['enc'].pop('center', None)
+    environment = env.Environment(config.settings)
+    layers = environment.hydrography.layers + environment.topography.layers
+    return dict(
+        layers=len(layers),
+        empty=sum(layer.geometry.is_empty for layer in layers),
+        wall_time=time.perf_counter() - start,
+        peak_rss=utils.profiling.peak_rss(),
+    )
+
+
+def read_regions(file_name) -> list:
+    regions = utils.config.read_yaml_into_dict(file_name)
+    regions = regions.get('regions') if isinstance(regions, dict) else None
+    if not regions:
+        raise ValueError(f"No 'regions' list found in {file_name}.")
+    for i, region in enumerate(regions):
+        region.setdefault('name', f"region{i}")
+    return regions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build the chart caches of several regions in parallel."
+    )
+    parser.add_argument('regions', help="YAML file with a list of regions")
+    parser.add_argument(
+        '--config', default=str(utils.paths.config),
+        help="configuration file with the settings shared by all regions",
+    )
+    parser.add_argument(
+        '--jobs', type=int, default=1,
+        help="number of regions built at once, each in its own process",
+    )
+    parser.add_argument(
+        '--force', action='store_true',
+        help="process every layer again, even if it is cached",
+    )
+    args = parser.parse_args(argv)
+
+    regions = read_regions(args.regions)
+    jobs, failed = {}, []
+    start = time.perf_counter()
+    print(f"Building {len(regions)} regions with {args.jobs} jobs...")
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        for region in regions:
+            overrides = {k: v for k, v in region.items() if k != 'name'}
+            overrides.update(new_data=args.force, verbose=False)
+            job = pool.submit(build_region, args.config, overrides)
+            jobs[job] = region['name']
+        for i, job in enumerate(as_completed(jobs)):
+            name = jobs[job]
+            try:
+                result = job.result()
+            except Exception as error:
+                failed.append(name)
+                print(f"[{i + 1}/{len(jobs)}] {name}: failed, {error!r}")
+                continue
+            print(
+                f"[{i + 1}/{len(jobs)}] {name}: {result['layers']} layers "
+                f"({result['empty']} empty) in {result['wall_time']:.1f} s"
+            )
+    print(
+        f"Built {len(jobs) - len(failed)} of {len(jobs)} regions in "
+        f"{time.perf_counter() - start:.1f} s."
+    )
+    if failed:
+        print("Failed regions: " + ', '.join(failed))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
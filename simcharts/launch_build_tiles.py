@@ -0,0 +1,47 @@
+#!/usr/bin/env conda run -n simcharts_env
+"""Cuts the source databases into a tile pyramid offline, without ROS or a display.
+
+The pyramid covers the whole of the configured 'files', with the 'tile_size',
+'tile_levels', 'buffer', 'utm_zone', 'cache_format' and 'depths' of the
+configuration file, and is used by every extent loaded with 'tiles: True'.
+
+Run with 'ros2 run simcharts build_tiles'.
+"""
+import argparse
+import sys
+import time
+
+import simcharts.environment as env
+import simcharts.spatial as spl
+import simcharts.utils as utils
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build the tile pyramid of the configured source files."
+    )
+    parser.add_argument(
+        '--config', default=str(utils.paths.config),
+        help="configuration file with the sources and tile settings",
+    )
+    parser.add_argument(
+        '--workers', type=int, default=None,
+        help="number of worker processes, 'workers' of the configuration "
+             "file by default",
+    )
+    args = parser.parse_args(argv)
+
+    overrides = {} if args.workers is None else dict(workers=args.workers)
+    config = utils.config.SeaChartsConfig(args.config, **overrides)
+    scope = env.scope.Scope(config.settings, env.extent.Extent(config.settings))
+    start = time.perf_counter()
+    spl.build_tiles(scope)
+    print(
+        f"Built tile pyramid {scope.pyramid.key} in "
+        f"{time.perf_counter() - start:.1f} s."
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,7 +2,6 @@
 import rclpy
 import threading
 import simcharts.utils as utils
-from simcharts.enc import ENC
 from simcharts.nodes import LocalTrafficNode
 from simcharts_aisforwarder.nodes import AISpublisher
 
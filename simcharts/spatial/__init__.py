@@ -1,4 +1,8 @@
+from .arrays import PolygonArray
 from .base import Shape
-from .hypsometry import Hydrography, Topography
+from .hypsometry import Hydrography, Topography, build_tiles
 from .layers import supported_layers
+from .queries import ChartQuery
+from .raster import ChartRaster, load_raster
 from .shapes import Area, Arrow, Circle, Line, Path, Rectangle, Ship
+from .tiles import TilePyramid
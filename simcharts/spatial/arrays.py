@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+from typing import List
+
+import numpy as np
+import shapely
+from shapely import geometry as geo
+
+import simcharts.utils as utils
+
+# Points queried at once, bounding the memory held by temporary arrays.
+_BATCH_SIZE = 1 << 18
+# Cells of the point lookup grid for each part, and their minimum and maximum.
+_CELLS_PER_PART = 64
+_CELL_COUNT = 1 << 12, 1 << 16
+
+
+class PolygonArray:
+    """The component polygons of a layer as a Shapely geometry array.
+
+    Bounds, areas and ragged coordinate offsets of every part are computed
+    once, so predicates run over all parts in a single vectorized call and a
+    part or its exterior ring is accessed without building Python tuples.
+    The equivalent MultiPolygon is available through 'geometry'.
+    """
+
+    def __init__(self, parts, geometry=None):
+        self.parts = np.asarray(parts, dtype=object)
+        self.bounds = shapely.bounds(self.parts).reshape(-1, 4)
+        self.areas = shapely.area(self.parts)
+        self._geometry = geometry
+        self._coordinates = None
+        self._ring_offsets = None
+        self._polygon_offsets = None
+        self._tree = None
+        self._grid = None
+
+    @classmethod
+    def from_geometry(cls, geometry) -> PolygonArray:
+        parts = shapely.get_parts(geometry)
+        parts = parts[shapely.get_type_id(parts) == shapely.GeometryType.POLYGON]
+        parts = parts[~shapely.is_empty(parts)]
+        return cls(parts, geometry)
+
+    def __len__(self) -> int:
+        return len(self.parts)
+
+    def __getitem__(self, index) -> geo.Polygon:
+        return self.parts[index]
+
+    @property
+    def geometry(self) -> geo.MultiPolygon:
+        if self._geometry is None:
+            self._geometry = shapely.multipolygons(self.parts)
+        return self._geometry
+
+    @property
+    def coordinates(self) -> np.ndarray:
+        """All vertices of all parts as one (N, 2) float64 array."""
+        self._flatten()
+        return self._coordinates
+
+    @property
+    def ring_offsets(self) -> np.ndarray:
+        self._flatten()
+        return self._ring_offsets
+
+    @property
+    def polygon_offsets(self) -> np.ndarray:
+        self._flatten()
+        return self._polygon_offsets
+
+    @property
+    def tree(self) -> shapely.STRtree:
+        """An STR-tree over the parts, which are prepared for fast predicates
+        when it is built."""
+        if self._tree is None:
+            shapely.prepare(self.parts)
+            self._tree = shapely.STRtree(self.parts)
+        return self._tree
+
+    def compact(self, origin) -> np.ndarray:
+        """Returns 'coordinates' as float32 offsets from an origin."""
+        return utils.compact.encode(self.coordinates, origin)
+
+    def exterior(self, index) -> np.ndarray:
+        """Returns the exterior ring of a part as a view of 'coordinates'."""
+        ring = self.polygon_offsets[index]
+        start, stop = self.ring_offsets[ring], self.ring_offsets[ring + 1]
+        return self.coordinates[start:stop]
+
+    def exteriors(self) -> List[np.ndarray]:
+        return [self.exterior(i) for i in range(len(self))]
+
+    def segments(self) -> np.ndarray:
+        """Returns the segments of every ring of every part as an (M, 2, 2)
+        array of start and end points."""
+        coordinates = self.coordinates
+        if len(coordinates) < 2:
+            return np.empty((0, 2, 2))
+        joined = np.ones(len(coordinates) - 1, dtype=bool)
+        joined[self.ring_offsets[1:-1] - 1] = False
+        return np.stack((coordinates[:-1], coordinates[1:]), axis=1)[joined]
+
+    def candidates(self, bbox) -> np.ndarray:
+        """Returns the indices of the parts whose bounds overlap a bounding box."""
+        x_min, y_min, x_max, y_max = bbox
+        b = self.bounds
+        overlap = ((b[:, 0] <= x_max) & (b[:, 2] >= x_min)
+                   & (b[:, 1] <= y_max) & (b[:, 3] >= y_min))
+        return np.flatnonzero(overlap)
+
+    def intersecting(self, geometry) -> np.ndarray:
+        """Returns the indices of the parts intersecting a geometry."""
+        indices = self.candidates(geometry.bounds)
+        shapely.prepare(geometry)
+        return indices[shapely.intersects(geometry, self.parts[indices])]
+
+    def contains_xy(self, x, y) -> np.ndarray:
+        """Tells whether each of a batch of points lies within any part.
+
+        Each point is looked up in a uniform grid over the parts, whose cells
+        either lie within a part or list the parts crossing them. Points in
+        the former are inside, and the rest are tested against the listed
+        parts in one vectorized call.
+        """
+        x, y = np.atleast_1d(x, y)
+        x, y = np.broadcast_arrays(x, y)
+        shape, x, y = x.shape, x.ravel(), y.ravel()
+        inside = np.zeros(x.size, dtype=bool)
+        grid = self.grid if len(self) else None
+        for start in range(0, x.size if grid else 0, _BATCH_SIZE):
+            stop = min(start + _BATCH_SIZE, x.size)
+            cells = grid.cells(x[start:stop], y[start:stop])
+            found = cells >= 0
+            points = np.flatnonzero(found)
+            cells = cells[found]
+            inside[start + points[grid.covered[cells]]] = True
+            counts = np.diff(grid.offsets)[cells]
+            if not counts.any():
+                continue
+            first = np.repeat(grid.offsets[cells] - np.cumsum(counts) + counts,
+                              counts)
+            parts = grid.parts[first + np.arange(counts.sum())]
+            points = start + np.repeat(points, counts)
+            hits = shapely.contains_xy(self.parts[parts], x[points], y[points])
+            inside[points[hits]] = True
+        return inside.reshape(shape)
+
+    @property
+    def grid(self) -> _Grid:
+        """The uniform grid of cells looked up by 'contains_xy', built from the
+        tree on first use."""
+        if self._grid is None:
+            self._grid = _Grid(self)
+        return self._grid
+
+    def subtract_from(self, geometry):
+        """Returns a geometry less the area covered by the parts.
+
+        Only the parts intersecting the geometry take part in the difference,
+        each clipped to its bounds first.
+        """
+        indices = self.intersecting(geometry)
+        if len(indices) == 0:
+            return geometry
+        clipped = shapely.clip_by_rect(self.parts[indices], *geometry.bounds)
+        return geometry.difference(shapely.union_all(clipped))
+
+    def _flatten(self) -> None:
+        if self._coordinates is None:
+            if len(self):
+                _, coordinates, (rings, polygons) = shapely.to_ragged_array(
+                    self.parts
+                )
+            else:
+                coordinates = np.empty((0, 2))
+                rings = polygons = np.zeros(1, dtype=np.int64)
+            self._coordinates = coordinates
+            self._ring_offsets = rings
+            self._polygon_offsets = polygons
+
+
+class _Grid:
+    """Uniform cells over the bounds of a PolygonArray, each marked as covered
+    by a part or listing the parts crossing it, found through the tree."""
+
+    def __init__(self, array: PolygonArray):
+        x_min, y_min = array.bounds[:, :2].min(axis=0)
+        x_max, y_max = array.bounds[:, 2:].max(axis=0)
+        width, height = max(x_max - x_min, 1e-9), max(y_max - y_min, 1e-9)
+        count = np.clip(_CELLS_PER_PART * len(array), *_CELL_COUNT)
+        size = np.sqrt(width * height / count)
+        self.shape = (max(int(np.ceil(height / size)), 1),
+                      max(int(np.ceil(width / size)), 1))
+        self.origin = x_min, y_min
+        self.size = width / self.shape[1], height / self.shape[0]
+
+        rows, columns = np.divmod(np.arange(self.shape[0] * self.shape[1]),
+                                  self.shape[1])
+        boxes = shapely.box(
+            x_min + columns * self.size[0], y_min + rows * self.size[1],
+            x_min + (columns + 1) * self.size[0],
+            y_min + (rows + 1) * self.size[1],
+        )
+        cells, parts = array.tree.query(boxes, predicate='intersects')
+        within = shapely.contains_properly(array.parts[parts], boxes[cells])
+        self.covered = np.zeros(len(boxes), dtype=bool)
+        self.covered[cells[within]] = True
+        crossing = ~self.covered[cells]
+        cells, parts = cells[crossing], parts[crossing]
+        order = np.argsort(cells, kind='stable')
+        self.parts = parts[order]
+        self.offsets = np.zeros(len(boxes) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum(np.bincount(cells, minlength=len(boxes)))
+
+    def cells(self, x, y) -> np.ndarray:
+        """Returns the cell index of each point, or -1 outside the grid."""
+        column = np.floor((x - self.origin[0]) / self.size[0])
+        row = np.floor((y - self.origin[1]) / self.size[1])
+        outside = ~((column >= 0) & (column <= self.shape[1])
+                    & (row >= 0) & (row <= self.shape[0]))
+        column = np.minimum(column, self.shape[1] - 1)
+        row = np.minimum(row, self.shape[0] - 1)
+        cells = np.where(outside, -1, row * self.shape[1] + column)
+        cells = cells.astype(np.int64)
+        return cells
@@ -4,9 +4,19 @@ from abc import ABC
 from dataclasses import dataclass, field
 from typing import Any, List
 
+import numpy as np
+import shapely
 from shapely import geometry as geo
 from shapely import ops
 
+from .arrays import PolygonArray
+
+
+_polygonal_types = (
+    shapely.GeometryType.POLYGON, shapely.GeometryType.MULTIPOLYGON
+)
+_multi_polygon_type = shapely.GeometryType.MULTIPOLYGON
+
 
 @dataclass
 class Drawable:
@@ -98,6 +108,49 @@ class Shape(Drawable, ABC):
     def _record_to_geometry(record):
         return geo.shape(record["geometry"])
 
+    @staticmethod
+    def decode(records) -> np.ndarray:
+        """Converts a batch of records into an array of geometries in one call.
+
+        Polygonal records are flattened into ragged coordinate arrays and built
+        by Shapely in bulk, any other geometry types fall back to geo.shape.
+        """
+        rings, polygon_sizes, multi_sizes = [], [], []
+        single, other = [], []
+        for i, record in enumerate(records):
+            geometry = record["geometry"]
+            if geometry["type"] == "Polygon":
+                polygons = (geometry["coordinates"],)
+                single.append(i)
+            elif geometry["type"] == "MultiPolygon":
+                polygons = geometry["coordinates"]
+            else:
+                polygons = ()
+                other.append(i)
+            multi_sizes.append(len(polygons))
+            for polygon in polygons:
+                polygon_sizes.append(len(polygon))
+                rings.extend(polygon)
+
+        ring_sizes = np.fromiter(
+            map(len, rings), dtype=np.int64, count=len(rings)
+        )
+        coordinates = np.fromiter(
+            (v for ring in rings for point in ring for v in point[:2]),
+            dtype=np.float64, count=2 * int(ring_sizes.sum()),
+        ).reshape(-1, 2)
+        offsets = tuple(
+            np.concatenate(([0], np.cumsum(sizes, dtype=np.int64)))
+            for sizes in (ring_sizes, polygon_sizes, multi_sizes)
+        )
+        geometries = shapely.from_ragged_array(
+            shapely.GeometryType.MULTIPOLYGON, coordinates, offsets
+        )
+        geometries[single] = shapely.get_geometry(geometries[single], 0)
+        for i in other:
+            geometries[i] = Shape._record_to_geometry(records[i])
+        return geometries
+
     @staticmethod
     def as_multi(geometry):
         if isinstance(geometry, geo.Point):
@@ -109,15 +162,32 @@ class Shape(Drawable, ABC):
         else:
             raise NotImplementedError(type(geometry))
 
+    @staticmethod
+    def repair(geometries):
+        geometries = np.asarray(geometries, dtype=object)
+        invalid = ~shapely.is_valid(geometries)
+        if not invalid.any():
+            return geometries
+        parts = shapely.get_parts(shapely.make_valid(geometries[invalid]))
+        polygonal = np.isin(shapely.get_type_id(parts), _polygonal_types)
+        return np.concatenate([geometries[~invalid], parts[polygonal]])
+
     @staticmethod
     def collect(geometries):
-        if any(not g.is_valid for g in geometries):
-            geometries = [g.buffer(0) if not g.is_valid else g for g in geometries]
-        geometry = ops.unary_union(geometries)
+        geometry = shapely.union_all(Shape.repair(geometries))
         if not geometry.is_valid:
             geometry = geometry.buffer(0)
         return geometry
 
+    @staticmethod
+    def collect_raw(geometries):
+        geometries = np.asarray(geometries, dtype=object)
+        multi = shapely.get_type_id(geometries) == _multi_polygon_type
+        parts = np.empty_like(geometries)
+        parts[multi] = shapely.get_geometry(geometries[multi], 0)
+        parts[~multi] = shapely.buffer(geometries[~multi], 1)
+        return shapely.multipolygons(parts)
+
     @staticmethod
     def line_between(point1, point2):
         return geo.LineString([point1, point2])
@@ -129,6 +199,8 @@ class Shape(Drawable, ABC):
 
 @dataclass
 class Layer(Shape, ABC):
+    _parts: Any = field(default=None, init=False, repr=False, compare=False)
+
     @property
     def _external_labels(self) -> List[str]:
         raise NotImplementedError
@@ -141,29 +213,62 @@ class Layer(Shape, ABC):
     def label(self) -> str:
         return self.name.lower()
 
+    @property
+    def source(self):
+        depth = self.depth if hasattr(self, "depth") else 0
+        return self.label, self._external_labels, depth
+
+    def __getstate__(self):
+        return dict(self.__dict__, _parts=None)
+
+    @property
+    def parts(self) -> PolygonArray:
+        """The polygons of the layer as an array, rebuilt whenever its geometry
+        is replaced."""
+        if self._parts is None or self._parts.geometry is not self.geometry:
+            self._parts = PolygonArray.from_geometry(self.geometry)
+        return self._parts
+
     def save(self, parser):
         parser.write(self)
 
     def load_shapefile(self, parser):
-        records = list(parser.read_shapefile(self.label))
-        if len(records) > 0:
-            self.geometry = self._record_to_geometry(records[0])
+        geometry = parser.read_layer(self.label)
+        if geometry is not None:
+            self.geometry = geometry
             if isinstance(self.geometry, geo.Polygon):
                 self.geometry = self.as_multi(self.geometry)
 
     def load_fgdb(self, parser):
-        depth = self.depth if hasattr(self, "depth") else 0
-        return list(parser.read_fgdb(self.label, self._external_labels, depth))
+        return list(parser.read_fgdb(*self.source))
 
     def unify(self, records):
-        geometries = [self._record_to_geometry(r) for r in records]
-        self.geometry = self.collect(geometries)
+        self.geometry = self.collect(self.decode(records))
 
     def extract_raw(self, records):
-        geometries = [self._record_to_geometry(r) for r in records]
-        self.geometry = geo.MultiPolygon(
-            [list(g)[0] if isinstance(g, geo.MultiPolygon) else g.buffer(1) for g in geometries]
-        )
+        self.geometry = self.collect_raw(self.decode(records))
+
+    def unify_stream(self, chunks) -> None:
+        """Unifies a stream of geometry arrays, one bounded chunk at a time.
+
+        Each chunk is merged on its own, and partial results of equal rank are
+        merged pairwise as they appear, so only one chunk of geometries and a
+        logarithmic number of partial unions are held in memory at once.
+        """
+        partials = []
+        for chunk in chunks:
+            geometry, rank = self.collect(chunk), 0
+            while partials and partials[-1][0] == rank:
+                geometry = self.collect([partials.pop()[1], geometry])
+                rank += 1
+            partials.append((rank, geometry))
+        if partials:
+            self.geometry = self.collect([g for _, g in partials])
+
+    def extract_raw_stream(self, chunks) -> None:
+        partials = [self.collect_raw(chunk) for chunk in chunks]
+        if partials:
+            self.geometry = shapely.multipolygons(shapely.get_parts(partials))
 
 
 @dataclass
@@ -190,6 +295,19 @@ class MultiDepthLocations(Locations, MultiDepth, ABC):
 class Regions(Layer, ABC):
     geometry: geo.MultiPolygon = geo.MultiPolygon()
 
+    def clip(self, bbox):
+        """Clips the regions to a bounding box, dropping the lines and points
+        left where they only touch its edges."""
+        super().clip(bbox)
+        if shapely.get_type_id(self.geometry) in _polygonal_types:
+            return
+        parts = shapely.get_parts(self.geometry)
+        parts = parts[np.isin(shapely.get_type_id(parts), _polygonal_types)]
+        if len(parts) == 0:
+            self.geometry = geo.MultiPolygon()
+        else:
+            self.geometry = shapely.union_all(parts)
+
 
 @dataclass
 class ZeroDepthRegions(Regions, ZeroDepth, ABC):
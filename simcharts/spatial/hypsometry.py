@@ -1,15 +1,34 @@
 from __future__ import annotations
 
+import threading
 import time
 from abc import ABC
+from collections import defaultdict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dataclasses import InitVar, dataclass, field
+from datetime import datetime
+from functools import partial
 from typing import Dict, List
 
+import numpy as np
+import shapely
+
 import simcharts.environment.scope as env
+import simcharts.utils as utils
 
 from .base import Layer
+from .tiles import Grid, TilePyramid
 from .layers import Land, Seabed, Shore
 
+# Rough bytes held per buffered record coordinate, from the parsed Python
+# record down to its Shapely geometry, with half the memory ceiling left
+# for partial unions.
+_POINT_COST = 512
+# Held by each load, as loads from several threads share the run journal and
+# manifest state of the chart cache.
+_LOADING = threading.RLock()
+
 
 @dataclass
 class _Hypsometry(ABC):
@@ -22,80 +41,580 @@ class _Hypsometry(ABC):
     def layers(self) -> List[Layer]:
         raise NotImplementedError
 
-    def add_buffer(self, layer, distance):
+    @staticmethod
+    def add_buffer(layer, distance):
         raise NotImplementedError
 
     @property
     def loaded_layers(self) -> List[Layer]:
         return [layer for layer in self.layers if not layer.geometry.is_empty]
 
-    def load(self, scope: env.Scope):
-        layers = [x for x in self.layers if x.label in scope.layers]
-        if scope.new_data:
+    def load(self, scope: env.Scope, layers: List[Layer] = None):
+        if layers is None:
+            layers = self.layers
+        with _LOADING:
+            self._load(scope, [x for x in layers if x.label in scope.layers])
+
+    def _load(self, scope: env.Scope, layers: List[Layer]):
+        if scope.tiles:
+            for layer in layers:
+                layer.geometry = scope.pyramid.assemble(
+                    layer.label, scope.extent.bbox, scope.tolerance
+                )
+            return
+
+        cache = scope.parser.cache
+        if not scope.new_data:
+            completed = [x.label for x in layers]
+        elif cache is not None:
+            completed = cache.begin([x.label for x in layers])
+        else:
+            completed = []
+        for layer in layers:
+            if layer.label in completed:
+                layer.load_shapefile(scope.parser)
+        layers = [
+            x for x in layers
+            if x.label not in completed or not scope.parser.is_cached(x.label)
+        ]
+        if cache is not None:
+            layers = self._resume(layers, scope)
+
+        if layers:
             if scope.parser.verbose:
                 print(
                     f"Processing {scope.extent.area // 10 ** 6} km^2 of "
                     f"{self.__class__.__name__} features from: "
                     + ', '.join(scope.files)
                 )
+            profile = utils.profiling.Profile(scope.profile)
+            manifest, bases = None, {}
+            if scope.incremental and not scope.raw_data and cache is not None:
+                manifest = utils.cache.FeatureManifest()
+                # Spliced windows are simplified apart from the rest of a
+                # layer, which only matches a rebuild simplified per cell.
+                if not scope.new_data and (
+                    scope.cell_size > 0 or not scope.tolerance
+                ):
+                    bases = self._bases(layers, scope)
+            if manifest is not None and bases:
+                mode = 'incremental'
+                self._load_incremental(layers, scope, profile, manifest, bases)
+            elif scope.memory_limit > 0:
+                mode = 'streaming'
+                self._load_streaming(layers, scope, profile)
+            elif scope.cell_size > 0:
+                mode = 'partitioned'
+                self._load_partitioned(layers, scope, profile, manifest)
+            elif scope.workers > 1:
+                mode = 'parallel'
+                self._load_parallel(layers, scope, profile, manifest)
+            else:
+                mode = 'serial'
+                self._load_serial(layers, scope, profile, manifest)
+
+            if scope.profile:
+                self._write_report(layers, scope, profile, mode)
+            if scope.parser.verbose:
+                peak = utils.profiling.peak_rss()
+                if peak is not None:
+                    print(f"Peak memory usage: {peak:.0f} MB")
+                print()
+
+        if cache is not None:
+            cache.end()
+            if layers:
+                cache.evict(scope.layers)
+
+    def _resume(self, layers, scope: env.Scope):
+        """Finishes layers interrupted after a checkpointed stage, and buffers
+        layers anew whose unbuffered geometry is cached for another buffer,
+        unless forced to process new data.
+
+        Returns the layers that still need to be processed from scratch.
+        """
+        cache = scope.parser.cache
+        remaining = []
+        for layer in layers:
+            stage, geometry = cache.restore_stage(layer.label)
+            action = f"Resuming {layer.name} after its {stage} stage"
+            if stage is None and not scope.new_data:
+                geometry = cache.unbuffered(layer.label)
+                if geometry is not None:
+                    stage = utils.cache.BASE_STAGE
+                    cache.save_stage(layer.label, stage, geometry)
+                    action = f"Buffering cached {layer.name} anew"
+            if stage is None:
+                remaining.append(layer)
+                continue
+            if scope.parser.verbose:
+                print(f"{action}...")
+            layer.geometry = geometry
+            _refine_layer(
+                layer, scope, self.add_buffer, scope.extent.bbox,
+                utils.profiling.Profile(enabled=False),
+                after=stage,
+            )
+            layer.save(scope.parser)
+        return remaining
+
+    def _write_report(self, layers, scope: env.Scope, profile, mode):
+        name = self.__class__.__name__
+        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        report_path = (
+            utils.paths.reports / f"ingestion_{name.lower()}_{timestamp}.json"
+        )
+        profile.write(
+            report_path, hypsometry=name, mode=mode, files=scope.files,
+            bbox=list(scope.extent.bbox), buffer=scope.buffer,
+            tolerance=scope.tolerance, raw_data=scope.raw_data,
+            workers=scope.workers, layers=[x.label for x in layers],
+        )
+        if scope.parser.verbose:
+            print(f"Wrote ingestion profile to {report_path}")
+
+    @staticmethod
+    def _save(layer, scope: env.Scope, profile):
+        with profile.stage(layer.label, 'write', geometry=layer.geometry):
+            layer.save(scope.parser)
+
+    @classmethod
+    def _save_empty(cls, layer, scope: env.Scope, profile):
+        """Saves a layer without source geometries, checkpointed as empty
+        before buffering, so no other buffer scans the sources for it."""
+        _checkpoint(layer, scope, utils.cache.BASE_STAGE)
+        cls._save(layer, scope, profile)
+
+    def _load_serial(self, layers, scope: env.Scope, profile, manifest=None):
+        geometries = _scan(
+            scope.parser, [layer.source for layer in layers], profile, manifest
+        )
+        self._record(layers, scope, manifest)
+        for layer in layers:
+            start_time = time.time()
+            info = f"{len(geometries[layer.label])} {layer.name} geometries"
+
+            if len(geometries[layer.label]) == 0:
+                if scope.parser.verbose:
+                    print(f"\rFound {info}.\n")
+                self._save_empty(layer, scope, profile)
+                continue
+
+            _, stages = _process_layer(
+                layer, geometries.pop(layer.label), scope, self.add_buffer,
+                profile.child(), scope.parser.verbose
+            )
+            profile.merge(stages)
+
+            self._save(layer, scope, profile)
+            if scope.parser.verbose:
+                end_time = round(time.time() - start_time, 1)
+                print(
+                    f"\rSaved {info} to shapefile in {end_time} seconds."
+                )
+
+    def _load_parallel(self, layers, scope: env.Scope, profile,
+                       manifest=None):
+        start_time = time.time()
+        sources = [layer.source for layer in layers]
+        with ProcessPoolExecutor(max_workers=scope.workers) as pool:
+            scans = [
+                pool.submit(
+                    _scan_source, sources, file_name, scope, profile.child(),
+                    None if manifest is None else manifest.child()
+                )
+                for file_name in scope.files
+            ]
+            geometries = defaultdict(list)
+            for scan in scans:
+                decoded_labels, stages, features = scan.result()
+                profile.merge(stages)
+                if manifest is not None:
+                    manifest.merge(features)
+                for label, decoded in decoded_labels.items():
+                    geometries[label].extend(decoded)
+            self._record(layers, scope, manifest)
+
+            jobs = {}
             for layer in layers:
-                start_time = time.time()
-                records = layer.load_fgdb(scope.parser)
-                info = f"{len(records)} {layer.name} geometries"
-
-                if not records:
-                    if scope.parser.verbose:
-                        print(f"\rFound {info}.\n")
-                    return
-
-                if scope.raw_data:
-                    if scope.parser.verbose:
-                        print(f"\rExtracting raw data from {info}...", end='')
-                    layer.extract_raw(records)
-                else:
-                    if scope.parser.verbose:
-                        print(f"\rMerging {info}...", end='')
-                    layer.unify(records)
-
-                    if scope.parser.verbose:
-                        print(f"\rSimplifying {info}...", end='')
-                    layer.simplify(scope.tolerance)
-
-                    if scope.parser.verbose:
-                        print(f"\rBuffering {info}...", end='')
-                    self.add_buffer(layer, scope.buffer)
-
-                    if scope.parser.verbose:
-                        print(f"\rClipping {info}...", end='')
-                    layer.clip(scope.extent.bbox)
-
-                layer.save(scope.parser)
+                decoded = geometries.pop(layer.label, [])
+                if len(decoded) == 0:
+                    self._save_empty(layer, scope, profile)
+                    continue
+                job = pool.submit(
+                    _process_layer, layer, decoded, scope, self.add_buffer,
+                    profile.child()
+                )
+                jobs[job] = layer
+            for job in as_completed(jobs):
+                layer = jobs[job]
+                layer.geometry, stages = job.result()
+                profile.merge(stages)
+                self._save(layer, scope, profile)
                 if scope.parser.verbose:
                     end_time = round(time.time() - start_time, 1)
                     print(
-                        f"\rSaved {info} to shapefile in {end_time} seconds."
+                        f"Saved {layer.name} to shapefile "
+                        f"after {end_time} seconds."
                     )
 
-            if scope.parser.verbose:
-                print()
-        else:
+    def _load_partitioned(self, layers, scope: env.Scope, profile,
+                          manifest=None):
+        start_time = time.time()
+        geometries = _scan(
+            scope.parser, [layer.source for layer in layers], profile, manifest
+        )
+        self._record(layers, scope, manifest)
+        grid = Grid(scope.cell_size)
+        indices = grid.indices(scope.extent.bbox)
+        halo = scope.buffer + 2 * scope.tolerance + 1.0
+
+        with ProcessPoolExecutor(max_workers=scope.workers) as pool:
+            jobs = []
             for layer in layers:
-                layer.load_shapefile(scope.parser)
+                decoded = geometries.pop(layer.label)
+                with profile.stage(
+                    layer.label, 'partition', records=len(decoded),
+                    geometry=decoded
+                ) as stage:
+                    cells = _partition(
+                        layer.repair(decoded), grid, indices, halo,
+                        scope.extent.bbox
+                    )
+                    stage.output([p for pieces, _ in cells for p in pieces])
+                jobs.append((layer, [
+                    pool.submit(
+                        _process_cell, layer, pieces, bbox, scope,
+                        self.add_buffer, profile.child()
+                    )
+                    for pieces, bbox in cells
+                ]))
+            for layer, cells in jobs:
+                if cells:
+                    parts = []
+                    for cell in cells:
+                        geometry, stages = cell.result()
+                        profile.merge(stages)
+                        parts.append(geometry)
+                    with profile.stage(
+                        layer.label, 'stitch', records=len(parts),
+                        geometry=parts
+                    ) as stage:
+                        layer.geometry = layer.collect(parts)
+                        stage.output(layer.geometry)
+                self._save(layer, scope, profile)
+                if scope.parser.verbose:
+                    end_time = round(time.time() - start_time, 1)
+                    print(
+                        f"\rSaved {layer.name} from {len(cells)} cells "
+                        f"to shapefile after {end_time} seconds."
+                    )
+
+    def _load_incremental(self, layers, scope: env.Scope, profile, manifest,
+                          bases):
+        start_time = time.time()
+        geometries = _scan(
+            scope.parser, [layer.source for layer in layers], profile, manifest
+        )
+        self._record(layers, scope, manifest)
+        grid = Grid(scope.cell_size or scope.tile_size)
+        halo = scope.buffer + 2 * scope.tolerance + 1.0
+        extent = set(grid.indices(scope.extent.bbox))
+        changes = {}
+
+        with ProcessPoolExecutor(max_workers=scope.workers) as pool:
+            jobs = []
+            for layer in layers:
+                entry, meta = bases[layer.label]
+                if meta['manifest'] not in changes:
+                    with profile.stage('*', 'changes') as stage:
+                        previous = scope.parser.cache.load_manifest(
+                            meta['manifest']
+                        )
+                        changes[meta['manifest']] = _affected_cells(
+                            manifest.changes(previous), grid, halo, extent
+                        )
+                        stage.entry['records'] = len(previous.keys)
+                        stage.entry['cells'] = len(changes[meta['manifest']])
+                indices = changes[meta['manifest']]
+                decoded = geometries.pop(layer.label)
+                with profile.stage(
+                    layer.label, 'partition', records=len(decoded),
+                    geometry=decoded, cells=len(indices)
+                ) as stage:
+                    cells = _partition(
+                        layer.repair(decoded), grid, indices, halo,
+                        scope.extent.bbox
+                    )
+                    stage.output([p for pieces, _ in cells for p in pieces])
+                region = _region(grid, indices, scope.extent.bbox)
+                jobs.append((layer, entry, meta, region, [
+                    pool.submit(
+                        _process_cell, layer, pieces, bbox, scope,
+                        self.add_buffer, profile.child()
+                    )
+                    for pieces, bbox in cells
+                ]))
+            for layer, entry, meta, region, cells in jobs:
+                parts = []
+                for cell in cells:
+                    geometry, stages = cell.result()
+                    profile.merge(stages)
+                    parts.append(geometry)
+                with profile.stage(
+                    layer.label, 'splice', records=len(parts), geometry=parts
+                ) as stage:
+                    if not meta.get('empty'):
+                        base = scope.parser.storage.read(
+                            entry / (layer.label + scope.parser.storage.suffix)
+                        )
+                        if region is not None:
+                            base = base.difference(region)
+                        parts.append(base)
+                    if parts:
+                        layer.geometry = layer.collect(parts)
+                    stage.output(layer.geometry)
+                self._save(layer, scope, profile)
+                if scope.parser.verbose:
+                    end_time = round(time.time() - start_time, 1)
+                    print(
+                        f"\rUpdated {len(cells)} cells of {layer.name} "
+                        f"after {end_time} seconds."
+                    )
+
+    @staticmethod
+    def _bases(layers, scope: env.Scope):
+        """Returns the previous cache entry of each layer, if all have one."""
+        bases = {}
+        suffix = scope.parser.storage.suffix
+        for layer in layers:
+            entry, meta = scope.parser.cache.previous(layer.label)
+            if entry is None or not (
+                meta.get('empty') or (entry / (layer.label + suffix)).exists()
+            ):
+                return {}
+            bases[layer.label] = entry, meta
+        return bases
+
+    @staticmethod
+    def _record(layers, scope: env.Scope, manifest):
+        if manifest is not None:
+            labels = [layer.label for layer in layers]
+            scope.parser.cache.save_manifest(manifest, labels)
+
+    def _load_streaming(self, layers, scope: env.Scope, profile):
+        start_time = time.time()
+        workers = min(scope.workers, len(layers))
+        max_points = scope.memory_limit * 2 ** 20 // (_POINT_COST * workers)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                jobs = {
+                    pool.submit(
+                        _stream_layer, layer, scope, self.add_buffer,
+                        max_points, profile.child()
+                    ): layer
+                    for layer in layers
+                }
+                results = (
+                    (jobs[job], job.result()) for job in as_completed(jobs)
+                )
+                self._save_streamed(results, scope, profile, start_time)
+        else:
+            results = (
+                (layer, _stream_layer(
+                    layer, scope, self.add_buffer, max_points,
+                    profile.child(), scope.parser.verbose
+                ))
+                for layer in layers
+            )
+            self._save_streamed(results, scope, profile, start_time)
+
+    def _save_streamed(self, results, scope: env.Scope, profile, start_time):
+        for layer, (geometry, stages) in results:
+            profile.merge(stages)
+            layer.geometry = geometry
+            self._save(layer, scope, profile)
+            if scope.parser.verbose:
+                end_time = round(time.time() - start_time, 1)
+                print(
+                    f"\rSaved {layer.name} to shapefile "
+                    f"after {end_time} seconds."
+                )
+
+
+class Bathymetry(Mapping):
+    """Seabed layers by depth, each loaded the first time it is accessed.
+
+    Iterating over the depths does not load anything, while looking up a depth
+    or its values loads that layer with the given load function, at most once.
+    Layers that are not yet stored, as told by the given function, are loaded
+    together on the first access to any of them, so the sources are scanned
+    once for all of them.
+    """
+
+    def __init__(self, depths: List[int], load, stored=None):
+        self._layers = {d: Seabed(d) for d in depths}
+        self._lock = threading.Lock()
+        self._loaded = set()
+        self._load = load
+        self._stored = stored
+
+    def __getitem__(self, depth) -> Layer:
+        layer = self._layers[depth]
+        if depth not in self._loaded:
+            with self._lock:
+                if depth not in self._loaded:
+                    layers = [layer]
+                    if self._stored is not None and not self._stored(layer):
+                        layers += [
+                            x for d, x in self._layers.items()
+                            if d != depth and d not in self._loaded
+                            and not self._stored(x)
+                        ]
+                    self._load(layers)
+                    self._loaded.update(x.depth for x in layers)
+        return layer
+
+    def __iter__(self):
+        return iter(self._layers)
+
+    def __len__(self):
+        return len(self._layers)
+
+    @property
+    def loaded(self) -> List[int]:
+        return [d for d in self._layers if d in self._loaded]
+
+    def prefetch(self) -> threading.Thread:
+        """Loads all remaining depths in a background thread, shallowest first."""
+        thread = threading.Thread(
+            target=lambda: [self[d] for d in self], daemon=True
+        )
+        thread.start()
+        return thread
+
+
+class DepthBands(Mapping):
+    """Seabed layers by depth, held as disjoint depth bands.
+
+    The band of a depth holds the area of its layer outside every deeper
+    layer, so each area is held once, even where simplified layers are not
+    strictly nested. The cumulative Seabed layer of a depth, covering
+    everything at least as deep, is built as the union of the bands at or
+    below it when first looked up, and kept from then on.
+    """
+
+    def __init__(self, layers: Dict[int, Layer]):
+        self.depths = sorted(layers)
+        self.bands = {}
+        deeper = None
+        for depth in reversed(self.depths):
+            geometry = layers[depth].geometry
+            if deeper is None:
+                self.bands[depth], deeper = geometry, geometry
+            else:
+                self.bands[depth] = geometry.difference(deeper)
+                deeper = deeper.union(geometry)
+        self._layers = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, depth) -> Layer:
+        if depth not in self.bands:
+            raise KeyError(depth)
+        with self._lock:
+            layer = self._layers.get(depth)
+            if layer is None:
+                layer = self._layers[depth] = self._union(depth)
+        return layer
+
+    def __iter__(self):
+        return iter(self.depths)
+
+    def __len__(self):
+        return len(self.depths)
+
+    def _union(self, depth) -> Layer:
+        bands = [g for d, g in self.bands.items() if d >= depth]
+        geometry = shapely.union_all(bands)
+        if isinstance(geometry, shapely.Polygon):
+            geometry = shapely.MultiPolygon([geometry])
+        layer = Seabed(depth)
+        layer.geometry = geometry
+        return layer
+
+    def __getstate__(self):
+        return {k: v for k, v in self.__dict__.items() if k != '_lock'}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
 
 
 @dataclass
 class Hydrography(_Hypsometry):
-    bathymetry: Dict[int, Layer] = field(init=False)
+    """The Seabed layers of each depth.
+
+    Given the Hydrography of a previous scope with other depths but otherwise
+    the same settings, only the layers of new depths are loaded, and the rest
+    is taken from the previous layers.
+    """
+    bathymetry: Mapping[int, Layer] = field(init=False)
+    previous: InitVar[Hydrography] = None
 
     @property
     def layers(self):
         return [*self.bathymetry.values()]
 
-    def __post_init__(self, scope: env.Scope):
-        self.bathymetry = {d: Seabed(d) for d in scope.depths}
-        self.load(scope)
+    @property
+    def loaded_depths(self) -> List[int]:
+        """The depths whose layers are loaded, without loading any others."""
+        if isinstance(self.bathymetry, Bathymetry):
+            return self.bathymetry.loaded
+        return list(self.bathymetry)
+
+    @property
+    def loaded_layers(self) -> List[Layer]:
+        layers = [self.bathymetry[d] for d in self.loaded_depths]
+        return [x for x in layers if not x.geometry.is_empty]
+
+    def __post_init__(self, scope: env.Scope, previous: Hydrography = None):
+        if scope.lazy_depths:
+            self.bathymetry = Bathymetry(
+                scope.depths, partial(self.load, scope),
+                partial(self._is_stored, scope),
+            )
+            if scope.prefetch_depths:
+                self.bathymetry.prefetch()
+        else:
+            self.bathymetry = {d: Seabed(d) for d in scope.depths}
+            reused = self._reuse(previous)
+            layers = [x for d, x in self.bathymetry.items() if d not in reused]
+            if layers:
+                self.load(scope, layers)
+            if scope.depth_bands:
+                self.bathymetry = DepthBands(self.bathymetry)
 
-    def add_buffer(self, layer, distance):
+    @staticmethod
+    def _is_stored(scope: env.Scope, layer: Layer) -> bool:
+        """Tells whether a layer is read from tiles or the cache, rather than
+        processed from the sources."""
+        if scope.tiles or layer.label not in scope.layers:
+            return True
+        return not scope.new_data and scope.parser.is_cached(layer.label)
+
+    def _reuse(self, previous: Hydrography = None) -> List[int]:
+        """Restores the layers of depths loaded by a previous Hydrography, and
+        returns their depths."""
+        if previous is None or isinstance(previous.bathymetry, Bathymetry):
+            return []
+        reused = [d for d in self.bathymetry if d in previous.bathymetry]
+        for depth in reused:
+            geometry = previous.bathymetry[depth].geometry
+            self.bathymetry[depth].geometry = geometry
+        return reused
+
+    @staticmethod
+    def add_buffer(layer, distance):
         layer.erode(distance)
 
 
@@ -113,5 +632,326 @@ class Topography(_Hypsometry):
         self.shore = Shore()
         self.load(scope)
 
-    def add_buffer(self, layer, distance):
+    @staticmethod
+    def add_buffer(layer, distance):
         layer.dilate(distance)
+
+
+def _scan(parser, sources, profile, manifest=None):
+    geometries = defaultdict(list)
+    for file_name in parser.file_names:
+        keys = None if manifest is None else {}
+        tables = {}
+        with profile.stage('*', 'read', files=[file_name]) as stage:
+            records = parser.scan_fgdb(sources, [file_name], keys, tables)
+            stage.entry['records'] = len(
+                {id(r) for label in records.values() for r in label}
+            )
+        decoded = _decode(
+            records, profile, partial(parser.reprojection, file_name), tables,
+            keys, manifest
+        )
+        for label, label_geometries in decoded.items():
+            geometries[label].append(label_geometries)
+    return {
+        label: np.concatenate(label_geometries)
+        for label, label_geometries in geometries.items()
+    }
+
+
+def _stream(parser, layer: Layer, max_points, counts):
+    """Yields decoded geometry arrays of at most max_points coordinates, one
+    source table at a time, as each table may have its own CRS."""
+    label, external_labels, depth = layer.source
+    for file_name in parser.file_names:
+        for external_label in external_labels:
+            table = external_label
+            if isinstance(external_label, dict):
+                table = external_label['layer']
+            reproject = parser.reprojection(file_name, table)
+            records = parser.read_fgdb(
+                label, [external_label], depth, file_names=[file_name]
+            )
+            for chunk in _chunks(records, max_points):
+                counts.append(len(chunk))
+                geometries = layer.decode(chunk)
+                if reproject is not None:
+                    geometries = reproject(geometries)
+                yield geometries
+
+
+def _chunks(records, max_points):
+    chunk, points = [], 0
+    for record in records:
+        chunk.append(record)
+        points += _count_points(record["geometry"])
+        if points >= max_points:
+            yield chunk
+            chunk, points = [], 0
+    if chunk:
+        yield chunk
+
+
+def _count_points(geometry):
+    if geometry["type"] == "Polygon":
+        return sum(map(len, geometry["coordinates"]))
+    if geometry["type"] == "MultiPolygon":
+        return sum(len(r) for p in geometry["coordinates"] for r in p)
+    return 1
+
+
+def _decode(records, profile, reprojection=None, tables=None, keys=None,
+            manifest=None):
+    """Decodes the records of each label, once for records shared between
+    labels, and reprojects them with the reprojection of their table."""
+    unique, indices, positions = [], {}, {}
+    for label in list(records):
+        positions[label] = []
+        for record in records.pop(label):
+            key = id(record)
+            if key not in indices:
+                indices[key] = len(unique)
+                unique.append(record)
+            positions[label].append(indices[key])
+    with profile.stage('*', 'decode', records=len(unique)) as stage:
+        decoded = Layer.decode(unique)
+        stage.output(decoded)
+    groups = defaultdict(list)
+    if reprojection is not None:
+        for i, record in enumerate(unique):
+            groups[tables[id(record)]].append(i)
+    projections = {table: reprojection(table) for table in groups}
+    projections = {t: p for t, p in projections.items() if p is not None}
+    if projections:
+        with profile.stage(
+            '*', 'reproject', records=len(unique), geometry=decoded
+        ) as stage:
+            for table, reproject in projections.items():
+                selected = np.asarray(groups[table], dtype=np.intp)
+                decoded[selected] = reproject(decoded[selected])
+            stage.output(decoded)
+    if manifest is not None:
+        with profile.stage('*', 'hash', records=len(unique)):
+            manifest.add(
+                [keys[id(r)] for r in unique], decoded,
+                [dict(r['properties']) for r in unique]
+            )
+    return {
+        label: decoded[np.asarray(p, dtype=np.intp)]
+        for label, p in positions.items()
+    }
+
+
+def _affected_cells(changes, grid: Grid, halo, extent):
+    """Returns the grid cells within reach of any changed feature bounds."""
+    cells = set()
+    for x_min, y_min, x_max, y_max in changes.tolist():
+        cells.update(grid.indices(
+            (x_min - halo, y_min - halo, x_max + halo, y_max + halo)
+        ))
+    return sorted(cells & extent)
+
+
+def _region(grid: Grid, indices, bbox):
+    """Returns the area covered by the given grid cells within the bounding box."""
+    if not indices:
+        return None
+    boxes = shapely.box(*np.array([grid.cell_bbox(i) for i in indices]).T)
+    return shapely.box(*bbox).intersection(shapely.union_all(boxes))
+
+
+def _partition(geometries, grid: Grid, indices, halo, bbox):
+    """Clips geometries to every grid cell they touch within the bounding box.
+
+    Each cell keeps the geometries within a halo around it, so that buffering
+    and simplification near its edges match those of an unpartitioned layer.
+    """
+    if len(geometries) == 0:
+        return []
+    tree = shapely.STRtree(geometries)
+    cells = []
+    for index in indices:
+        x_min, y_min, x_max, y_max = grid.cell_bbox(index)
+        cell_bbox = (max(x_min, bbox[0]), max(y_min, bbox[1]),
+                     min(x_max, bbox[2]), min(y_max, bbox[3]))
+        halo_bbox = grid.cell_bbox(index, halo)
+        hits = tree.query(shapely.box(*halo_bbox))
+        if len(hits) == 0:
+            continue
+        pieces = shapely.clip_by_rect(geometries[hits], *halo_bbox)
+        pieces = pieces[~shapely.is_empty(pieces)]
+        if len(pieces) > 0:
+            cells.append((pieces, cell_bbox))
+    return cells
+
+
+def _process_cell(layer: Layer, pieces, bbox, scope: env.Scope, add_buffer,
+                  profile):
+    cell = dict(cell=list(bbox))
+    with profile.stage(
+        layer.label, 'union', records=len(pieces), geometry=pieces, **cell
+    ) as stage:
+        layer.geometry = layer.collect(pieces)
+        stage.output(layer.geometry)
+    _refine_layer(layer, scope, add_buffer, bbox, profile, cell=cell)
+    return layer.geometry, profile
+
+
+def _scan_source(sources, file_name: str, scope: env.Scope, profile,
+                 manifest=None):
+    parser = utils.ShapefileParser(
+        scope.extent.bbox, [file_name], False, scope.epsg
+    )
+    return _scan(parser, sources, profile, manifest), profile, manifest
+
+
+def _process_layer(layer: Layer, geometries, scope: env.Scope, add_buffer,
+                   profile, verbose=False):
+    info = f"{len(geometries)} {layer.name} geometries"
+    if scope.raw_data:
+        if verbose:
+            print(f"\rExtracting raw data from {info}...", end='')
+        with profile.stage(
+            layer.label, 'extract_raw', records=len(geometries),
+            geometry=geometries
+        ) as stage:
+            layer.geometry = layer.collect_raw(geometries)
+            stage.output(layer.geometry)
+        return layer.geometry, profile
+
+    if verbose:
+        print(f"\rMerging {info}...", end='')
+    with profile.stage(
+        layer.label, 'union', records=len(geometries), geometry=geometries
+    ) as stage:
+        layer.geometry = layer.collect(geometries)
+        stage.output(layer.geometry)
+    _checkpoint(layer, scope, 'union')
+    _refine_layer(
+        layer, scope, add_buffer, scope.extent.bbox, profile, info, verbose
+    )
+    return layer.geometry, profile
+
+
+def _stream_layer(layer: Layer, scope: env.Scope, add_buffer, max_points,
+                  profile, verbose=False):
+    counts = []
+    chunks = _stream(scope.parser, layer, max_points, counts)
+    if scope.raw_data:
+        if verbose:
+            print(f"\rExtracting raw data from {layer.name}...", end='')
+        with profile.stage(layer.label, 'stream_raw') as stage:
+            layer.extract_raw_stream(chunks)
+            stage.entry['records'] = sum(counts)
+            stage.output(layer.geometry)
+        return layer.geometry, profile
+
+    if verbose:
+        print(f"\rMerging {layer.name} geometries in chunks...", end='')
+    with profile.stage(layer.label, 'stream_union') as stage:
+        layer.unify_stream(chunks)
+        count = stage.entry['records'] = sum(counts)
+        stage.output(layer.geometry)
+    if count > 0:
+        _checkpoint(layer, scope, 'union')
+    if count == 0:
+        _checkpoint(layer, scope, utils.cache.BASE_STAGE)
+        return layer.geometry, profile
+    info = f"{count} {layer.name} geometries"
+    _refine_layer(
+        layer, scope, add_buffer, scope.extent.bbox, profile, info, verbose
+    )
+    return layer.geometry, profile
+
+
+def _refine_layer(layer: Layer, scope: env.Scope, add_buffer, bbox, profile,
+                  info=None, verbose=False, cell=None, after=None):
+    steps = [
+        ('simplify', 'Simplifying', lambda: layer.simplify(scope.tolerance)),
+        ('buffer', 'Buffering', lambda: add_buffer(layer, scope.buffer)),
+        ('clip', 'Clipping', lambda: layer.clip(bbox)),
+    ]
+    names = [name for name, _, _ in steps]
+    start = names.index(after) + 1 if after in names else 0
+    for name, action, step in steps[start:]:
+        if verbose:
+            print(f"\r{action} {info}...", end='')
+        with profile.stage(
+            layer.label, name, geometry=layer.geometry, **(cell or {})
+        ) as stage:
+            step()
+            stage.output(layer.geometry)
+        if cell is None:
+            _checkpoint(layer, scope, name)
+
+
+def _checkpoint(layer: Layer, scope: env.Scope, stage):
+    if scope.parser.cache is not None and stage in utils.cache.STAGES:
+        scope.parser.cache.save_stage(layer.label, stage, layer.geometry)
+
+
+def build_tiles(scope: env.Scope) -> None:
+    """Cuts the whole source database into the tile pyramid of the scope.
+
+    Every configured layer is unified, simplified at each tile level, buffered
+    and clipped tile by tile, using the scope's worker processes.
+    """
+    layers = [(Seabed(d), Hydrography.add_buffer) for d in scope.depths]
+    layers += [(Land(), Topography.add_buffer), (Shore(), Topography.add_buffer)]
+    layers = [(x, buffer) for x, buffer in layers if x.label in scope.layers]
+    pyramid = scope.pyramid
+    bounds = scope.parser.bounds([x.source for x, _ in layers])
+    indices = pyramid.indices(bounds)
+    if scope.parser.verbose:
+        print(
+            f"Building {len(indices)} tiles of {len(layers)} layers "
+            f"at tolerances {pyramid.levels} from: " + ', '.join(scope.files)
+        )
+
+    tiles = {x.label: {f"{level:g}": [] for level in pyramid.levels}
+             for x, _ in layers}
+    with ProcessPoolExecutor(max_workers=scope.workers) as pool:
+        jobs = {
+            pool.submit(_build_tile, layers, index, pyramid): index
+            for index in indices
+        }
+        for i, job in enumerate(as_completed(jobs)):
+            for label, levels in job.result().items():
+                for level in levels:
+                    tiles[label][f"{level:g}"].append(jobs[job])
+            if scope.parser.verbose:
+                print(f"\rTiles built: {i + 1}/{len(indices)}", end='')
+    pyramid.commit(bounds, tiles)
+    if scope.parser.verbose:
+        print()
+
+
+def _build_tile(layers, index, pyramid: TilePyramid):
+    """Builds one tile of every layer, and returns the levels at which each
+    layer is not empty there. A small area may vanish at coarse levels only,
+    so every level is built regardless of those before it."""
+    bbox = pyramid.tile_bbox(index, pyramid.halo)
+    parser = utils.ShapefileParser(bbox, pyramid.files, False, pyramid.epsg)
+    geometries = _scan(
+        parser, [x.source for x, _ in layers],
+        utils.profiling.Profile(enabled=False)
+    )
+    built = {}
+    for layer, add_buffer in layers:
+        clipped = shapely.clip_by_rect(
+            layer.repair(geometries.pop(layer.label)), *bbox
+        )
+        if len(clipped) == 0:
+            continue
+        merged = layer.collect(clipped)
+        for level in pyramid.levels:
+            layer.geometry = merged
+            layer.simplify(level)
+            add_buffer(layer, pyramid.buffer)
+            layer.clip(pyramid.tile_bbox(index))
+            if layer.geometry.is_empty:
+                continue
+            pyramid.write_tile(level, layer.label, index, layer.depth,
+                               layer.geometry)
+            built.setdefault(layer.label, []).append(level)
+    return built
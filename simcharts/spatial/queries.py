@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import shapely
+
+from .arrays import _BATCH_SIZE, PolygonArray
+from .base import Layer
+
+# Distance in meters within which a segment counts as part of the chart frame.
+_FRAME_TOLERANCE = 1e-3
+# Children of each node of the boundary segment trees. Narrow nodes prune
+# nearest neighbour searches best, at twice the speed of the default of 10.
+_NODE_CAPACITY = 2
+# Cells along each side of the grid ordering points for nearest searches.
+_ORDER_CELLS = 256
+
+
+class ChartQuery:
+    """Vectorized queries of point batches against the layers of a chart.
+
+    Points are given as an (N, 2) array of eastings and northings. Each layer
+    answers through the STR-tree over its component polygons, built the
+    first time the layer is queried, so a point is only tested against the
+    few parts whose bounds hold it.
+    """
+
+    def __init__(self, hydrography, topography, bbox=None):
+        self.hydrography = hydrography
+        self.topography = topography
+        self.bbox = bbox
+        self.depths: List[int] = sorted(hydrography.bathymetry)
+        self._seabeds: Dict[int, Layer] = {}
+        self._boundaries: Dict[int, shapely.STRtree] = {}
+        self._segments: Dict[int, np.ndarray] = {}
+
+    def on_land(self, points) -> np.ndarray:
+        """Tells whether each point lies on land."""
+        x, y = _coordinates(points)
+        return self.topography.land.parts.contains_xy(x, y)
+
+    def on_shore(self, points) -> np.ndarray:
+        """Tells whether each point lies on the shore."""
+        x, y = _coordinates(points)
+        return self.topography.shore.parts.contains_xy(x, y)
+
+    def depth_bins(self, points) -> np.ndarray:
+        """Returns the index into 'depths' of the deepest Seabed layer holding
+        each point, or -1 for points in none of them, such as on land."""
+        x, y = _coordinates(points)
+        bins = np.full(x.shape, -1, dtype=np.int32)
+        remaining = np.arange(x.size)
+        for i in reversed(range(len(self.depths))):
+            if remaining.size == 0:
+                break
+            layer = self.seabed(i)
+            inside = layer.parts.contains_xy(x[remaining], y[remaining])
+            bins[remaining[inside]] = i
+            remaining = remaining[~inside]
+        return bins
+
+    def seabed(self, depth_bin) -> Layer:
+        """Returns the Seabed layer of a depth bin, kept for the life of the
+        query, so its parts and STR-tree are built once."""
+        if depth_bin not in self._seabeds:
+            self._seabeds[depth_bin] = self.hydrography.bathymetry[
+                self.depths[depth_bin]
+            ]
+        return self._seabeds[depth_bin]
+
+    def bin_of(self, depth) -> int:
+        return depth_bin(self.depths, depth)
+
+    def navigable(self, points, depth=0) -> np.ndarray:
+        """Tells whether each point lies off land and shore, in water known
+        to be at least the given depth deep."""
+        x, y = _coordinates(points)
+        navigable = self.depth_bins(points) >= self.bin_of(depth)
+        for layer in self.topography.layers:
+            candidates = np.flatnonzero(navigable)
+            navigable[candidates] = ~layer.parts.contains_xy(
+                x[candidates], y[candidates]
+            )
+        return navigable
+
+    def nearest_hazards(self, points, depth=0, max_distance=None):
+        """Returns the distance from each point to the nearest land or water
+        shallower than the given depth, and the nearest point there.
+
+        Each point is matched to its nearest hazard boundary segment through
+        an STR-tree over all segments, in logarithmic time, with the points
+        visited in spatial order so that consecutive searches share nodes.
+        Points already on a hazard are at distance 0 from themselves. Points
+        without a hazard within 'max_distance' get an infinite distance and
+        NaN coordinates.
+        """
+        x, y = _coordinates(points)
+        distances = np.full(x.size, np.inf)
+        nearest = np.full((x.size, 2), np.nan)
+        hazard = ~self.navigable(points, depth)
+        distances[hazard] = 0.0
+        nearest[hazard] = np.column_stack((x[hazard], y[hazard]))
+        depth_bin = self.bin_of(depth)
+        tree, segments = self.boundary(depth_bin), self._segments[depth_bin]
+        indices = np.flatnonzero(~hazard)
+        indices = indices[_spatial_order(x[indices], y[indices])]
+        for start in range(0, indices.size if len(segments) else 0,
+                           _BATCH_SIZE):
+            batch = indices[start:start + _BATCH_SIZE]
+            (found, matches), distance = tree.query_nearest(
+                shapely.points(x[batch], y[batch]), max_distance=max_distance,
+                return_distance=True, all_matches=False,
+            )
+            found = batch[found]
+            distances[found] = distance
+            nearest[found] = _project(
+                np.column_stack((x[found], y[found])), segments[matches]
+            )
+        return distances, nearest
+
+    def validate_paths(self, paths, draft=0, clearance=0.0):
+        """Checks a batch of paths against land and water shallower than the
+        draft of a vessel.
+
+        Each path is a (K, 2) array of waypoints, where further columns such
+        as headings are ignored. Returns for each path whether it stays off
+        land, in water at least 'draft' deep and 'clearance' meters from any
+        hazard, the index of its first segment that does not, or -1, and its
+        minimum distance to a hazard, which is 0 for paths entering one. A
+        path of a single waypoint has the index 0 if that waypoint fails.
+
+        All waypoints are tested at once, and each whole path is measured to
+        the nearest hazard through the STR-tree over boundary segments. Only
+        the segments of failing paths are then tested against the tree, in
+        one vectorized call.
+        """
+        paths = [np.atleast_2d(np.asarray(p, dtype=np.float64))[:, :2]
+                 for p in paths]
+        counts = np.array([len(p) for p in paths], dtype=np.int64)
+        valid = np.ones(len(paths), dtype=bool)
+        first = np.full(len(paths), -1, dtype=np.int64)
+        clearances = np.full(len(paths), np.inf)
+        if counts.sum() == 0:
+            return valid, first, clearances
+        vertices = np.concatenate([p for p in paths if len(p)])
+        path_of = np.repeat(np.arange(len(paths)), counts)
+        stranded = ~self.navigable(vertices, draft)
+
+        depth_bin = self.bin_of(draft)
+        tree = self.boundary(depth_bin)
+        if len(tree.geometries):
+            lines = np.flatnonzero(counts > 1)
+            points = np.flatnonzero(counts == 1)
+            on_line = counts[path_of] > 1
+            geometries = np.concatenate((
+                shapely.linestrings(
+                    vertices[on_line],
+                    indices=np.searchsorted(lines, path_of[on_line]),
+                ) if len(lines) else np.empty(0, dtype=object),
+                shapely.points(vertices[counts[path_of] == 1]),
+            ))
+            (found, _), distance = tree.query_nearest(
+                geometries, return_distance=True, all_matches=False
+            )
+            clearances[np.concatenate((lines, points))[found]] = distance
+        entered = np.bincount(path_of[stranded], minlength=len(paths)) > 0
+        clearances[entered] = 0.0
+        valid = (clearances > 0) & (clearances >= clearance)
+        valid[counts == 0] = True
+
+        failed = ~valid & (counts > 1)
+        first[~valid & (counts == 1)] = 0
+        if failed.any():
+            sizes = np.maximum(counts - 1, 0)
+            segment_path = np.repeat(np.arange(len(paths)), sizes)
+            index = np.arange(sizes.sum()) - (np.cumsum(sizes)
+                                              - sizes)[segment_path]
+            kept = failed[segment_path]
+            segment_path, index = segment_path[kept], index[kept]
+            head = (np.cumsum(counts) - counts)[segment_path] + index
+            violating = stranded[head] | stranded[head + 1]
+            if len(tree.geometries):
+                starts, ends = vertices[head], vertices[head + 1]
+                segments = shapely.linestrings(np.stack((starts, ends), axis=1))
+                # Tree queries match no segment between repeated waypoints,
+                # so those are queried as points.
+                repeated = (starts == ends).all(axis=1)
+                segments[repeated] = shapely.points(starts[repeated])
+                if clearance > 0:
+                    hits, _ = tree.query(segments, predicate='dwithin',
+                                         distance=clearance)
+                else:
+                    hits, _ = tree.query(segments, predicate='intersects')
+                violating[hits] = True
+            index[~violating] = np.iinfo(np.int64).max
+            earliest = np.full(len(paths), np.iinfo(np.int64).max)
+            np.minimum.at(earliest, segment_path, index)
+            first[failed] = earliest[failed]
+        return valid, first, clearances
+
+    def boundary(self, depth_bin) -> shapely.STRtree:
+        """Returns an STR-tree over the boundary segments of the water of a
+        depth bin off land and shore, leaving out those along the chart
+        frame, which only mark the end of the chart."""
+        if depth_bin not in self._boundaries:
+            water = self.seabed(depth_bin).geometry
+            for layer in self.topography.layers:
+                water = layer.parts.subtract_from(water)
+            segments = PolygonArray.from_geometry(water).segments()
+            if self.bbox is not None and len(segments):
+                x_min, y_min, x_max, y_max = self.bbox
+                x, y = segments[:, :, 0], segments[:, :, 1]
+                frame = np.zeros(len(segments), dtype=bool)
+                for values, edge in ((x, x_min), (x, x_max),
+                                     (y, y_min), (y, y_max)):
+                    on_edge = np.abs(values - edge) <= _FRAME_TOLERANCE
+                    frame |= on_edge.all(axis=1)
+                segments = segments[~frame]
+            self._segments[depth_bin] = segments
+            self._boundaries[depth_bin] = shapely.STRtree(
+                shapely.linestrings(segments), node_capacity=_NODE_CAPACITY
+            )
+        return self._boundaries[depth_bin]
+
+    def classify(self, points) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the land mask and depth bin indices of each point."""
+        return self.on_land(points), self.depth_bins(points)
+
+
+def depth_bin(depths, depth) -> int:
+    """Returns the index of the shallowest depth bin at least the given depth
+    deep, whose points are therefore known to be that deep."""
+    for i, d in enumerate(depths):
+        if d >= depth:
+            return i
+    raise ValueError(
+        f"No depth bin is {depth} m deep, the deepest is {depths[-1]} m."
+    )
+
+
+def _project(points, segments) -> np.ndarray:
+    """Returns the point on each segment nearest to each point."""
+    start, step = segments[:, 0], segments[:, 1] - segments[:, 0]
+    length = np.einsum('ij,ij->i', step, step)
+    t = np.einsum('ij,ij->i', points - start, step)
+    t = np.clip(np.divide(t, length, out=np.zeros_like(t), where=length > 0),
+                0.0, 1.0)
+    return start + t[:, None] * step
+
+
+def _spatial_order(x, y) -> np.ndarray:
+    """Returns the order visiting points cell by cell in a coarse grid."""
+    if x.size == 0:
+        return np.arange(0)
+    size = max(np.ptp(x), np.ptp(y), 1e-9) / _ORDER_CELLS
+    return np.lexsort((np.floor(x / size), np.floor(y / size)))
+
+
+def _coordinates(points) -> Tuple[np.ndarray, np.ndarray]:
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return points[:, 0], points[:, 1]
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import shapely
+
+import simcharts.utils as utils
+
+from .layers import Seabed
+from .queries import ChartQuery, _coordinates, depth_bin
+
+# Bump whenever the raster channels or their layout change.
+RASTER_VERSION = 1
+# Number of rasters kept, most recently written first.
+KEEP = 4
+# Rows of cells rasterized at once, bounding the memory held by cell boxes.
+_ROWS_PER_BATCH = 256
+
+
+class ChartRaster:
+    """Land, depth and distance channels of a chart sampled on a square grid.
+
+    Row 0 of each channel is the southern edge of the chart. For each cell,
+    'land' is 0 where it holds no land or shore, 1 where it holds some and
+    2 where it is covered. 'shallowest' is the depth bin of the deepest
+    Seabed layer covering the whole cell, so its depth is the minimum depth
+    of the cell, and 'deepest' that of the deepest layer reaching into it,
+    or -1 for none. 'distance' is the signed distance in meters from the
+    cell center to the nearest boundary of land or water shallower than
+    'depth', positive in the water deep enough and negative outside it. The
+    edge of the chart does not count as a boundary.
+
+    Lookups are a constant number of array operations per point. Cells only
+    partly deep enough are resolved against the exact polygons of 'query'.
+    """
+
+    channels = 'land', 'shallowest', 'deepest', 'distance'
+
+    def __init__(self, origin, resolution, depths, depth, land, shallowest,
+                 deepest, distance, query: ChartQuery = None):
+        self.origin = tuple(float(v) for v in origin)
+        self.resolution = float(resolution)
+        self.depths = [int(d) for d in depths]
+        self.depth = depth
+        self.land = land
+        self.shallowest = shallowest
+        self.deepest = deepest
+        self.distance = distance
+        self.query = query
+
+    @property
+    def shape(self):
+        return self.land.shape
+
+    @classmethod
+    def build(cls, query: ChartQuery, bbox, resolution,
+              depth=0) -> ChartRaster:
+        """Rasterizes the layers of a chart over its bounding box."""
+        x_min, y_min, x_max, y_max = bbox
+        shape = (max(int(np.ceil((y_max - y_min) / resolution)), 1),
+                 max(int(np.ceil((x_max - x_min) / resolution)), 1))
+        land = np.zeros(shape, dtype=np.int8)
+        shallowest = np.full(shape, -1, dtype=np.int8)
+        deepest = np.full(shape, -1, dtype=np.int8)
+        layers = [query.topography.land, query.topography.shore]
+        seabeds = [query.seabed(i) for i in range(len(query.depths))]
+        columns = np.arange(shape[1])
+        for start in range(0, shape[0], _ROWS_PER_BATCH):
+            rows = np.arange(start, min(start + _ROWS_PER_BATCH, shape[0]))
+            row, column = (a.ravel() for a in np.meshgrid(rows, columns,
+                                                          indexing='ij'))
+            boxes = shapely.box(
+                x_min + column * resolution, y_min + row * resolution,
+                x_min + (column + 1) * resolution,
+                y_min + (row + 1) * resolution,
+            )
+            cells = (row, column)
+            for layer in layers:
+                covered, reached = _coverage(layer.parts, boxes)
+                land[cells] = np.maximum(
+                    land[cells], np.where(covered, 2, reached.astype(np.int8))
+                )
+            low = np.full(len(boxes), -1, dtype=np.int8)
+            high = np.full(len(boxes), -1, dtype=np.int8)
+            for i in reversed(range(len(seabeds))):
+                open_low, open_high = low < 0, high < 0
+                if not open_low.any():
+                    break
+                covered, reached = _coverage(seabeds[i].parts, boxes)
+                low[open_low & covered] = i
+                high[open_high & reached] = i
+            shallowest[cells] = low
+            deepest[cells] = high
+
+        hazard_bin = query.bin_of(depth)
+        row, column = (a.ravel() for a in np.indices(shape))
+        # The last cells may reach beyond the chart, so the centers are those
+        # of the part of each cell within it.
+        x, y = x_min + column * resolution, y_min + row * resolution
+        centers = np.column_stack((
+            (x + np.minimum(x + resolution, x_max)) / 2,
+            (y + np.minimum(y + resolution, y_max)) / 2,
+        ))
+        boundary = query.boundary(hazard_bin)
+        if len(boundary.geometries):
+            _, distance = boundary.query_nearest(
+                shapely.points(centers), return_distance=True,
+                all_matches=False,
+            )
+        else:
+            diagonal = np.hypot(x_max - x_min, y_max - y_min)
+            distance = np.full(len(centers), diagonal)
+        inside = query.navigable(centers, query.depths[hazard_bin])
+        distance = np.where(inside, distance, -distance).reshape(shape)
+        return cls((x_min, y_min), resolution, query.depths, depth, land,
+                   shallowest, deepest, distance.astype(np.float32), query)
+
+    @classmethod
+    def load(cls, file_path, query: ChartQuery = None) -> ChartRaster:
+        with np.load(file_path) as arrays:
+            return cls(
+                arrays['origin'], arrays['resolution'], arrays['depths'],
+                arrays['depth'].item(),
+                *(arrays[name] for name in cls.channels), query=query,
+            )
+
+    def save(self, file_path) -> None:
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = file_path.with_name(file_path.name + '.tmp')
+        with open(temporary, 'wb') as raster_file:
+            np.savez_compressed(
+                raster_file, origin=self.origin, resolution=self.resolution,
+                depths=self.depths, depth=self.depth,
+                **{name: getattr(self, name) for name in self.channels},
+            )
+        os.replace(temporary, file_path)
+
+    def cells(self, points):
+        """Returns the row and column of the cell holding each point, and
+        whether it lies on the grid at all."""
+        x, y = _coordinates(points)
+        column = np.floor((x - self.origin[0]) / self.resolution)
+        row = np.floor((y - self.origin[1]) / self.resolution)
+        on_grid = ((column >= 0) & (column < self.shape[1])
+                   & (row >= 0) & (row < self.shape[0]))
+        column = np.where(on_grid, column, 0).astype(np.int64)
+        row = np.where(on_grid, row, 0).astype(np.int64)
+        return row, column, on_grid
+
+    def min_depth(self, points) -> np.ndarray:
+        """Returns the minimum depth of the cell holding each point, or NaN
+        where it holds land or no Seabed layer covers the whole cell."""
+        row, column, on_grid = self.cells(points)
+        on_grid &= self.land[row, column] == 0
+        bins = np.where(on_grid, self.shallowest[row, column], -1)
+        depths = np.append(np.asarray(self.depths, dtype=np.float64), np.nan)
+        return depths[bins]
+
+    def occupancy(self, depth=0) -> np.ndarray:
+        """Returns the cells holding any land, or water shallower than the
+        given depth."""
+        shallow = self.shallowest < depth_bin(self.depths, depth)
+        return (self.land > 0) | shallow
+
+    def signed_distance(self, points) -> np.ndarray:
+        """Returns the signed distance to the nearest shallow water boundary,
+        interpolated bilinearly between the four nearest cell centers."""
+        x, y = _coordinates(points)
+        rows, columns = self.shape
+        u = np.clip((x - self.origin[0]) / self.resolution - 0.5,
+                    0, columns - 1)
+        v = np.clip((y - self.origin[1]) / self.resolution - 0.5, 0, rows - 1)
+        c0 = np.minimum(np.floor(u).astype(np.int64), max(columns - 2, 0))
+        r0 = np.minimum(np.floor(v).astype(np.int64), max(rows - 2, 0))
+        c1, r1 = np.minimum(c0 + 1, columns - 1), np.minimum(r0 + 1, rows - 1)
+        du, dv = u - c0, v - r0
+        d = self.distance
+        return ((d[r0, c0] * (1 - du) + d[r0, c1] * du) * (1 - dv)
+                + (d[r1, c0] * (1 - du) + d[r1, c1] * du) * dv)
+
+    def navigable(self, points, depth=0, exact=True) -> np.ndarray:
+        """Tells whether each point lies off land, in water at least the
+        given depth deep.
+
+        Cells wholly that deep and free of land, or wholly shallower or on
+        land, are answered from the grid. Points in the remaining cells along
+        depth contours and coastlines, and points on the southern or western
+        edge of the chart, where the layers end, are tested against the exact
+        polygons, or counted as not navigable unless 'exact'.
+        """
+        required = depth_bin(self.depths, depth)
+        row, column, on_grid = self.cells(points)
+        x, y = _coordinates(points)
+        on_edge = (x == self.origin[0]) | (y == self.origin[1])
+        land = self.land[row, column]
+        navigable = on_grid & (land == 0)
+        navigable &= self.shallowest[row, column] >= required
+        uncertain = on_grid & ~navigable & (land < 2)
+        uncertain &= self.deepest[row, column] >= required
+        uncertain |= navigable & on_edge
+        navigable &= ~on_edge
+        if exact and uncertain.any():
+            if self.query is None:
+                raise ValueError("Exact lookups require the chart query.")
+            points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+            navigable[uncertain] = self.query.navigable(
+                points[uncertain], depth
+            )
+        return navigable
+
+
+def load_raster(scope, query: ChartQuery) -> ChartRaster:
+    """Returns the raster of the layers of a query, read from the cache file
+    of its inputs, or built and written there unless new data is parsed."""
+    file_path = raster_file(scope, query)
+    if file_path.exists() and not scope.new_data:
+        try:
+            return ChartRaster.load(file_path, query)
+        except Exception:
+            file_path.unlink(missing_ok=True)
+    raster = ChartRaster.build(query, scope.extent.bbox,
+                               scope.raster_resolution, scope.raster_depth)
+    raster.save(file_path)
+    _evict()
+    return raster
+
+
+def raster_file(scope, query: ChartQuery):
+    """Returns the cache file of a raster, whose name hashes the cache keys
+    of the layers of the query and the raster settings of the scope."""
+    labels = [Seabed(d).label for d in query.depths]
+    labels += [x.label for x in query.topography.layers]
+    inputs = dict(
+        version=RASTER_VERSION,
+        layers=sorted(scope.parser.cache.key(x) for x in labels),
+        tiles=[scope.tiles, scope.tile_size, scope.tile_levels],
+        resolution=scope.raster_resolution,
+        depth=scope.raster_depth,
+    )
+    digest = hashlib.sha256(
+        json.dumps(inputs, sort_keys=True).encode('utf-8')
+    )
+    return utils.paths.rasters / f'{digest.hexdigest()[:20]}.npz'
+
+
+def _evict() -> None:
+    rasters = sorted(
+        utils.paths.rasters.glob('*.npz'),
+        key=lambda f: f.stat().st_mtime, reverse=True,
+    )
+    for old in rasters[KEEP:]:
+        old.unlink(missing_ok=True)
+
+
+def _coverage(parts, boxes):
+    """Tells for each box whether a single part covers it, and whether any
+    part reaches into it."""
+    covered = np.zeros(len(boxes), dtype=bool)
+    reached = np.zeros(len(boxes), dtype=bool)
+    if len(parts) == 0:
+        return covered, reached
+    cells, indices = parts.tree.query(boxes)
+    candidates = parts.parts[indices]
+    covered[cells[shapely.contains(candidates, boxes[cells])]] = True
+    reached[cells[shapely.intersects(candidates, boxes[cells])]] = True
+    return covered, reached
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+from typing import Dict, List, Tuple
+
+from shapely import geometry as geo
+
+import simcharts.utils as utils
+
+from .base import Shape
+
+MANIFEST_FILE = 'pyramid.json'
+
+
+class Grid:
+    """Square cells aligned to multiples of their size in the chart CRS."""
+
+    def __init__(self, size):
+        self.size = size
+
+    def indices(self, bbox) -> List[Tuple[int, int]]:
+        x_min, y_min, x_max, y_max = bbox
+        size = self.size
+        columns = range(math.floor(x_min / size), math.ceil(x_max / size))
+        rows = range(math.floor(y_min / size), math.ceil(y_max / size))
+        return [(i, j) for i in columns for j in rows]
+
+    def cell_bbox(self, index, halo=0.0) -> Tuple[float, float, float, float]:
+        i, j = index
+        size = self.size
+        return (i * size - halo, j * size - halo,
+                (i + 1) * size + halo, (j + 1) * size + halo)
+
+
+class TilePyramid:
+    """Fixed-size tiles of every chart layer, at several simplification levels.
+
+    Tiles are aligned to multiples of the tile size in the chart CRS, so any
+    extent maps to the same tiles regardless of its origin. Each tile is
+    processed with a halo around it before being clipped to its bounds, which
+    keeps buffers and simplification consistent across tile edges.
+    """
+
+    def __init__(self, files, tile_size, levels, buffer, epsg,
+                 cache_format='shapefile', compression='none', compact=False):
+        self.files = files
+        self.tile_size = tile_size
+        self.grid = Grid(tile_size)
+        self.levels = sorted(levels)
+        self.buffer = buffer
+        self.epsg = epsg
+        self.cache_format = cache_format
+        self.compact = compact
+        self.storage = utils.storage.backends[cache_format](
+            epsg, compression, compact
+        )
+        self._key = None
+        self._manifest = None
+
+    @property
+    def halo(self) -> float:
+        return self.buffer + 2 * self.levels[-1] + 1.0
+
+    @property
+    def key(self) -> str:
+        if self._key is None:
+            inputs = dict(
+                version=utils.cache.PIPELINE_VERSION,
+                sources=[utils.cache.source_identity(f) for f in self.files],
+                tile_size=self.tile_size,
+                levels=self.levels,
+                buffer=self.buffer,
+                epsg=self.epsg,
+                cache_format=self.cache_format,
+                compact=self.compact,
+            )
+            digest = hashlib.sha256(
+                json.dumps(inputs, sort_keys=True).encode('utf-8')
+            )
+            self._key = digest.hexdigest()[:20]
+        return self._key
+
+    @property
+    def root(self):
+        return utils.paths.tiles / self.key
+
+    @property
+    def manifest(self) -> dict:
+        if self._manifest is None:
+            manifest_path = self.root / MANIFEST_FILE
+            if not manifest_path.exists():
+                raise FileNotFoundError(
+                    f"No tile pyramid has been built for {self.files} with "
+                    f"tile size {self.tile_size}, levels {self.levels} and "
+                    f"buffer {self.buffer}, in EPSG:{self.epsg} as "
+                    f"{self.cache_format} files."
+                )
+            with open(manifest_path, encoding='utf-8') as manifest_file:
+                self._manifest = json.load(manifest_file)
+        return self._manifest
+
+    def level(self, tolerance) -> float:
+        """Returns the largest built level not above the tolerance."""
+        levels = sorted(self.manifest['levels'])
+        candidates = [level for level in levels if level <= tolerance]
+        return candidates[-1] if candidates else levels[0]
+
+    def indices(self, bbox) -> List[Tuple[int, int]]:
+        return self.grid.indices(bbox)
+
+    def tile_bbox(self, index, halo=0.0) -> Tuple[float, float, float, float]:
+        return self.grid.cell_bbox(index, halo)
+
+    def tile_path(self, level, label, index):
+        i, j = index
+        directory = self.root / f"t{level:g}" / label
+        return directory / f"{i}_{j}{self.storage.suffix}"
+
+    def write_tile(self, level, label, index, depth, geometry) -> None:
+        tile_path = self.tile_path(level, label, index)
+        tile_path.parent.mkdir(parents=True, exist_ok=True)
+        self.storage.write(
+            tile_path, depth, geometry, self.tile_bbox(index)[:2]
+        )
+
+    def commit(self, bounds,
+               tiles: Dict[str, Dict[str, List[Tuple[int, int]]]]) -> None:
+        """Writes the manifest of a built pyramid, listing the tiles of each
+        layer by level, as a layer may be empty at coarser levels only."""
+        manifest = dict(
+            tile_size=self.tile_size,
+            levels=self.levels,
+            buffer=self.buffer,
+            bounds=list(bounds),
+            tiles={
+                label: {level: sorted(indices)
+                        for level, indices in levels.items()}
+                for label, levels in tiles.items()
+            },
+        )
+        self.root.mkdir(parents=True, exist_ok=True)
+        temporary = self.root / (MANIFEST_FILE + '.tmp')
+        with open(temporary, 'w', encoding='utf-8') as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.replace(temporary, self.root / MANIFEST_FILE)
+        self._manifest = None
+
+    def assemble(self, label, bbox, tolerance):
+        if label not in self.manifest['tiles']:
+            raise ValueError(
+                f"Layer '{label}' is not part of the tile pyramid, "
+                f"rebuild it with the current depths."
+            )
+        level = self.level(tolerance)
+        built = {
+            tuple(index)
+            for index in self.manifest['tiles'][label].get(f"{level:g}", [])
+        }
+        geometries = [
+            self.storage.read(self.tile_path(level, label, index))
+            for index in self.indices(bbox) if index in built
+        ]
+        geometries = [g for g in geometries if g is not None]
+        if not geometries:
+            return geo.MultiPolygon()
+        geometry = Shape.collect(geometries)
+        geometry = geo.box(*bbox).intersection(geometry)
+        if isinstance(geometry, geo.Polygon):
+            geometry = Shape.as_multi(geometry)
+        return geometry
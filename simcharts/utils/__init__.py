@@ -1,4 +1,9 @@
+from . import cache
+from . import compact
 from . import config
 from . import files
 from . import geodesy
+from . import profiling
+from . import projection
+from . import snapshot
 from .parser import ShapefileParser
@@ -0,0 +1,340 @@
+"""Contains the content-addressed cache of processed chart layers."""
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+import shapely
+
+from . import paths as path
+
+# Bump whenever a change to the ingestion pipeline alters its output.
+PIPELINE_VERSION = 4
+
+ENTRY_FILE = 'entry.json'
+STAGES_DIR = 'stages'
+RUNS_DIR = 'runs'
+FEATURES_DIR = 'features'
+
+# Processing stages whose output is checkpointed, in pipeline order.
+STAGES = ('union', 'simplify', 'buffer')
+# Stage kept in committed entries, from which a layer is buffered anew when
+# only the buffer changes.
+BASE_STAGE = 'simplify'
+
+
+class ChartCache:
+    """Maps each layer to a cache entry keyed on everything its geometry depends on.
+
+    Entries live side by side in 'data/shapefiles/<label>/<key>/', so several
+    extents or parameter sets may be cached at once. The least recently used
+    entries are evicted once the total size exceeds the disk budget.
+
+    An entry only counts as cached once its entry file has been written, which
+    happens atomically after the layer itself. Until then, the entry may hold
+    checkpoints of finished processing stages, from which an interrupted layer
+    is resumed. Committed entries keep the checkpoint of the last stage
+    before buffering, so the layer is buffered anew for another buffer without
+    processing the sources again. Forced runs over new data are journaled in
+    'data/shapefiles/runs/', so a restarted run skips the layers it completed.
+    """
+
+    def __init__(self, bounding_box, file_names, buffer, tolerance, raw_data,
+                 budget, epsg=25833, compact=False, cell_size=0,
+                 memory_limit=0, workers=1):
+        self.file_names = file_names
+        self.inputs = dict(
+            version=PIPELINE_VERSION,
+            epsg=epsg,
+            bbox=list(bounding_box),
+            buffer=buffer,
+            tolerance=tolerance,
+            raw_data=raw_data,
+            compact=compact,
+        )
+        # Grid cells are simplified apart from each other, and streamed chunks
+        # merged in another order, which only changes simplified outlines.
+        if tolerance:
+            if memory_limit > 0:
+                self.inputs['partition'] = ['stream', memory_limit, workers]
+            elif cell_size > 0:
+                self.inputs['partition'] = ['cells', cell_size]
+        self.budget = budget * 2 ** 20
+        self._sources = None
+        self._keys = {}
+        self._run = None
+        self._journal = None
+        self._manifest = None
+
+    @property
+    def sources(self) -> list:
+        if self._sources is None:
+            self._sources = [source_identity(f) for f in self.file_names]
+        return self._sources
+
+    def key(self, label) -> str:
+        if label not in self._keys:
+            inputs = dict(self.inputs, label=label, sources=self.sources)
+            digest = hashlib.sha256(
+                json.dumps(inputs, sort_keys=True).encode('utf-8')
+            )
+            self._keys[label] = digest.hexdigest()[:20]
+        return self._keys[label]
+
+    def entry(self, label):
+        return path.shapefiles / label / self.key(label)
+
+    def layer_path(self, label, suffix):
+        entry = self.entry(label)
+        entry.mkdir(parents=True, exist_ok=True)
+        return entry / (label + suffix)
+
+    def is_cached(self, label) -> bool:
+        return (self.entry(label) / ENTRY_FILE).exists()
+
+    def is_empty(self, label) -> bool:
+        return self._read_entry(self.entry(label)).get('empty', False)
+
+    def invalidate(self, label) -> None:
+        (self.entry(label) / ENTRY_FILE).unlink(missing_ok=True)
+
+    def commit(self, label, empty=False) -> None:
+        entry = self.entry(label)
+        entry.mkdir(parents=True, exist_ok=True)
+        now = time.time()
+        self._write_entry(entry, dict(
+            self.inputs, label=label, sources=self.sources, empty=empty,
+            run=self._run, manifest=self._manifest,
+            created=now, last_used=now,
+        ))
+        for checkpoint in (entry / STAGES_DIR).glob('*'):
+            if checkpoint.name != f'{BASE_STAGE}.wkb':
+                checkpoint.unlink(missing_ok=True)
+
+    def begin(self, labels) -> list:
+        """Starts a forced run over the given layers.
+
+        Returns the layers already completed by an interrupted run over the
+        same layers and inputs, which need not be processed again.
+        """
+        digest = hashlib.sha256(
+            json.dumps(sorted(self.key(label) for label in labels)).encode()
+        )
+        name = digest.hexdigest()[:20] + '.json'
+        journal = self._journal = path.shapefiles / RUNS_DIR / name
+        if journal.exists():
+            with open(journal, encoding='utf-8') as journal_file:
+                self._run = json.load(journal_file)['run']
+            return [
+                label for label in labels if self.is_cached(label)
+                and self._read_entry(self.entry(label)).get('run') == self._run
+            ]
+        self._run = uuid.uuid4().hex
+        for label in labels:
+            shutil.rmtree(self.entry(label) / STAGES_DIR, ignore_errors=True)
+        journal.parent.mkdir(parents=True, exist_ok=True)
+        self._write_json(journal, dict(
+            run=self._run, labels=list(labels), started=time.time()
+        ))
+        return []
+
+    def end(self) -> None:
+        if self._run is not None:
+            self._journal.unlink(missing_ok=True)
+            self._run = self._journal = None
+        self._manifest = None
+
+    def save_stage(self, label, stage, geometry) -> None:
+        stages = self.entry(label) / STAGES_DIR
+        stages.mkdir(parents=True, exist_ok=True)
+        temporary = stages / f'{stage}.wkb.tmp'
+        temporary.write_bytes(shapely.to_wkb(geometry))
+        os.replace(temporary, stages / f'{stage}.wkb')
+
+    def restore_stage(self, label):
+        """Returns the last checkpointed stage of a layer and its geometry."""
+        stages = self.entry(label) / STAGES_DIR
+        for stage in reversed(STAGES):
+            checkpoint = stages / f'{stage}.wkb'
+            if checkpoint.exists():
+                return stage, shapely.from_wkb(checkpoint.read_bytes())
+        return None, None
+
+    def unbuffered(self, label):
+        """Returns the geometry of a layer before buffering, as kept by an
+        entry whose inputs only differ in the buffer, or None if there is
+        none."""
+        keys = [k for k in (*self.inputs, 'partition') if k != 'buffer']
+        inputs = [self.inputs.get(k) for k in keys]
+        for meta_file in (path.shapefiles / label).glob(f'*/{ENTRY_FILE}'):
+            meta = self._read_entry(meta_file.parent)
+            if meta.get('sources') != self.sources:
+                continue
+            if [meta.get(k) for k in keys] != inputs:
+                continue
+            checkpoint = meta_file.parent / STAGES_DIR / f'{BASE_STAGE}.wkb'
+            if checkpoint.exists():
+                return shapely.from_wkb(checkpoint.read_bytes())
+        return None
+
+    def previous(self, label):
+        """Returns the latest entry of a layer built from other source files.
+
+        Only entries with identical processing inputs and a recorded feature
+        manifest qualify, as a base for updating the layer incrementally.
+        """
+        candidates = []
+        for meta_file in (path.shapefiles / label).glob(f'*/{ENTRY_FILE}'):
+            meta = self._read_entry(meta_file.parent)
+            if meta.get('sources') == self.sources or not meta.get('manifest'):
+                continue
+            if any(meta.get(k) != v for k, v in self.inputs.items()):
+                continue
+            if self.manifest_path(meta['manifest']).exists():
+                candidates.append((meta['created'], meta_file.parent, meta))
+        if not candidates:
+            return None, None
+        _, entry, meta = max(candidates, key=lambda c: c[0])
+        return entry, meta
+
+    def manifest_path(self, name):
+        return path.shapefiles / FEATURES_DIR / f'{name}.npz'
+
+    def save_manifest(self, manifest, labels) -> None:
+        """Stores the features read for the given layers, and records them in
+        every entry committed afterwards."""
+        inputs = dict(self.inputs, labels=sorted(labels), sources=self.sources)
+        digest = hashlib.sha256(
+            json.dumps(inputs, sort_keys=True).encode('utf-8')
+        )
+        self._manifest = digest.hexdigest()[:20]
+        manifest_path = self.manifest_path(self._manifest)
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        manifest.save(manifest_path)
+
+    def load_manifest(self, name):
+        return FeatureManifest.load(self.manifest_path(name))
+
+    def touch(self, label) -> None:
+        entry = self.entry(label)
+        meta = self._read_entry(entry)
+        if meta:
+            meta['last_used'] = time.time()
+            self._write_entry(entry, meta)
+
+    def evict(self, labels) -> None:
+        entries = []
+        for meta_file in path.shapefiles.glob(f'*/*/{ENTRY_FILE}'):
+            entry = meta_file.parent
+            size = sum(f.stat().st_size for f in entry.rglob('*') if f.is_file())
+            last_used = self._read_entry(entry).get('last_used', 0)
+            entries.append((last_used, size, entry))
+
+        in_use = {self.key(label) for label in labels}
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.budget:
+                break
+            if entry.name in in_use:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    @staticmethod
+    def _read_entry(entry) -> dict:
+        try:
+            with open(entry / ENTRY_FILE, encoding='utf-8') as meta_file:
+                return json.load(meta_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @staticmethod
+    def _write_entry(entry, meta) -> None:
+        ChartCache._write_json(entry / ENTRY_FILE, meta)
+
+    @staticmethod
+    def _write_json(file_path, content) -> None:
+        temporary = file_path.with_name(file_path.name + '.tmp')
+        with open(temporary, 'w', encoding='utf-8') as json_file:
+            json.dump(content, json_file, indent=2)
+        os.replace(temporary, file_path)
+
+
+class FeatureManifest:
+    """Identifies every source feature of a scan by key, content and bounds.
+
+    Keys combine the source file, table and feature id, while digests hash
+    the decoded geometry and attributes, so comparing two manifests yields the
+    features added, removed or modified between two editions of the sources.
+    """
+
+    def __init__(self, keys=(), digests=(), bounds=None):
+        self.keys = list(keys)
+        self.digests = list(digests)
+        self.bounds = [] if bounds is None else list(bounds)
+
+    def add(self, keys, geometries, properties) -> None:
+        for key, geometry_wkb, attributes in zip(
+            keys, shapely.to_wkb(geometries), properties
+        ):
+            content = json.dumps(attributes, sort_keys=True, default=str)
+            digest = hashlib.blake2b(geometry_wkb, digest_size=16)
+            digest.update(content.encode('utf-8'))
+            self.keys.append(key)
+            self.digests.append(digest.hexdigest())
+        self.bounds.extend(shapely.bounds(geometries).tolist())
+
+    def child(self):
+        return FeatureManifest()
+
+    def merge(self, other) -> None:
+        self.keys.extend(other.keys)
+        self.digests.extend(other.digests)
+        self.bounds.extend(other.bounds)
+
+    def changes(self, previous) -> np.ndarray:
+        """Returns the bounds of every feature that differs from a previous
+        manifest, at both its old and its new location."""
+        old = dict(zip(previous.keys, zip(previous.digests, previous.bounds)))
+        changed = []
+        for key, digest, bounds in zip(self.keys, self.digests, self.bounds):
+            old_digest, old_bounds = old.pop(key, (None, None))
+            if old_digest != digest:
+                changed.append(bounds)
+                if old_bounds is not None:
+                    changed.append(old_bounds)
+        changed.extend(old_bounds for _, old_bounds in old.values())
+        return np.array(changed, dtype=float).reshape(-1, 4)
+
+    def save(self, file_path) -> None:
+        temporary = file_path.with_name(file_path.name + '.tmp.npz')
+        np.savez_compressed(
+            temporary, keys=np.array(self.keys, dtype=str),
+            digests=np.array(self.digests, dtype=str),
+            bounds=np.array(self.bounds, dtype=float).reshape(-1, 4),
+        )
+        os.replace(temporary, file_path)
+
+    @classmethod
+    def load(cls, file_path):
+        with np.load(file_path) as arrays:
+            return cls(
+                arrays['keys'].tolist(), arrays['digests'].tolist(),
+                arrays['bounds'].tolist(),
+            )
+
+
+def source_identity(file_name) -> list:
+    """Returns the name, total size and latest modification time of a source database."""
+    file_path = path.external / file_name
+    files = [file_path] if file_path.is_file() else sorted(file_path.rglob('*'))
+    size, mtime = 0, 0
+    for f in files:
+        if f.is_file():
+            stat = f.stat()
+            size += stat.st_size
+            mtime = max(mtime, stat.st_mtime_ns)
+    return [file_name, size, mtime]
@@ -1,6 +1,8 @@
 """Contains functionality for reading, processing and validating seacharts configuration settings"""
+import copy
+import os
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Set
 
 import yaml
 from cerberus import Validator
@@ -18,8 +20,7 @@ class SeaChartsConfig:
         self.validator = Validator(self._schema)
         self._valid_sections = self.extract_valid_sections()
 
-        self.parse(config_file_name)
-        self.override(**kwargs)
+        self.parse(config_file_name, **kwargs)
 
     @property
     def settings(self):
@@ -53,9 +54,43 @@ class SeaChartsConfig:
         for file_name in self._settings["enc"]["files"]:
             files.verify_directory_exists(file_name)
 
-    def parse(self, file_name=dcp.config) -> None:
+    def parse(self, file_name=dcp.config, section="enc", **kwargs) -> None:
+        if section not in self._valid_sections:
+            raise ValueError("Override settings in non-existing section!")
+        self._file_name, self._section, self._overrides = file_name, section, kwargs
+        self._modified = self._modification_time()
         self._settings = read_yaml_into_dict(file_name)
+        self._settings[section].update(kwargs)
+        fill_defaults(self._settings, self._schema)
         self.validate(self._settings)
+        self._parsed = copy.deepcopy(self._settings)
+
+    def changed(self) -> bool:
+        """Tells whether the configuration file was modified since it was read."""
+        return self._modification_time() != self._modified
+
+    def reload(self) -> Dict[str, Set[str]]:
+        """Reads the configuration file again, keeping the keyword overrides.
+
+        Returns the changed keys of each section. If the file can not be read
+        or is invalid, the current settings are kept and a ValueError raised.
+        """
+        settings, parsed = self._settings, self._parsed
+        try:
+            self.parse(self._file_name, self._section, **self._overrides)
+        except (OSError, yaml.YAMLError, ValueError) as error:
+            self._settings, self._parsed = settings, parsed
+            raise ValueError(
+                f"Kept the current settings, {self._file_name} is invalid: "
+                f"{error}"
+            ) from error
+        return diff(parsed, self._parsed)
+
+    def _modification_time(self):
+        try:
+            return os.stat(self._file_name).st_mtime_ns
+        except OSError:
+            return None
 
     def override(self, section="enc", **kwargs) -> None:
         if not kwargs:
@@ -79,6 +114,35 @@ def read_yaml_into_dict(file_name=dcp.config) -> dict:
     return output_dict
 
 
+def fill_defaults(settings: dict, schema: dict, defaults=None) -> None:
+    """Fills the optional keys missing from each section of the settings with
+    their values in the packaged configuration file, where it has them."""
+    if defaults is None:
+        defaults = read_yaml_into_dict(dcp.config)
+    for section, rules in schema.items():
+        values, fallback = settings.get(section), defaults.get(section)
+        if not isinstance(values, dict) or not isinstance(fallback, dict):
+            continue
+        for key, rule in rules.get('schema', {}).items():
+            if not rule.get('required') and key not in values and key in fallback:
+                values[key] = copy.deepcopy(fallback[key])
+
+
+def diff(old: dict, new: dict) -> Dict[str, Set[str]]:
+    """Returns the keys of each section whose values differ between two
+    settings, leaving out unchanged sections."""
+    changes = {}
+    for section in old.keys() | new.keys():
+        before, after = old.get(section) or {}, new.get(section) or {}
+        keys = {
+            key for key in before.keys() | after.keys()
+            if before.get(key) != after.get(key)
+        }
+        if keys:
+            changes[section] = keys
+    return changes
+
+
 def parse_key(key, defaults):
     """Returns default config parameter value for a given key, if it exists.
 
@@ -1,5 +1,4 @@
 import numpy as np
-from pyproj import Proj
 
 def longlat2utm(long, lat, hemisphere='N'):
     '''
@@ -28,6 +27,7 @@ def longlat2utm(long, lat, hemisphere='N'):
         zone = _getUTMZone(long[0])
     else:
         zone = _getUTMZone(long)
+    from pyproj import Proj
     hem = "north" if hemisphere == 'N' else "south"
     myproj = Proj(f"+proj=utm +zone={zone} +{hem} +datum=WGS84 +units=m +no_defs ")
     N, E = myproj(long, lat)
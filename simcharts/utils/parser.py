@@ -1,27 +1,93 @@
 import warnings
-
-import fiona
+from bisect import bisect_right
 
 from . import paths as path
+from . import projection
+from . import storage
 
 
 class ShapefileParser:
-    def __init__(self, bounding_box, file_names, verbose):
+    def __init__(self, bounding_box, file_names, verbose, epsg=25833,
+                 cache_format='shapefile', compression='none', cache=None,
+                 compact=False):
         self.bounding_box = bounding_box
         self.file_names = file_names
         self.verbose = verbose
+        self.epsg = epsg
+        self.storage = storage.backends[cache_format](
+            epsg, compression, compact
+        )
+        self.cache = cache
 
-    def read_fgdb(self, label, external_labels, depth):
-        for file_name in self.file_names:
+    def read_fgdb(self, label, external_labels, depth, file_names=None):
+        for file_name in file_names or self.file_names:
             file_path = path.external / file_name
             records = self._parse_layers(file_path, external_labels, depth)
             yield from self._parse_records(records, label)
 
+    def scan_fgdb(self, sources, file_names=None, keys=None, tables=None):
+        plan = self._scan_plan(sources)
+        sinks = {label: [] for label, _, _ in sources}
+        for file_name in file_names or self.file_names:
+            file_path = path.external / file_name
+            for table, (unfiltered, filtered) in plan.items():
+                records = self._read_spatial_file(file_path, layer=table)
+                for record in self._parse_records(records, table):
+                    if keys is not None:
+                        key = f"{file_name}/{table}/{record['id']}"
+                        keys[id(record)] = key
+                    if tables is not None:
+                        tables[id(record)] = table
+                    for label in unfiltered:
+                        sinks[label].append(record)
+                    for depth_label, (depths, labels) in filtered.items():
+                        depth = record['properties'][depth_label]
+                        for label in labels[:bisect_right(depths, depth)]:
+                            sinks[label].append(record)
+        return sinks
+
+    def bounds(self, sources):
+        import fiona
+        x_min, y_min, x_max, y_max = (float('inf'),) * 2 + (-float('inf'),) * 2
+        for file_name in self.file_names:
+            file_path = path.external / file_name
+            for table in self._scan_plan(sources):
+                with fiona.open(file_path, 'r', layer=table) as source:
+                    if len(source) == 0:
+                        continue
+                    bounds = projection.from_source(
+                        source.bounds, source.crs_wkt, self.epsg
+                    )
+                x_min, y_min = min(x_min, bounds[0]), min(y_min, bounds[1])
+                x_max, y_max = max(x_max, bounds[2]), max(y_max, bounds[3])
+        return x_min, y_min, x_max, y_max
+
+    def reprojection(self, file_name, table):
+        return projection.reprojection(
+            path.external / file_name, table, self.epsg
+        )
+
     def read_shapefile(self, label):
         file_path = self._shapefile_path(label)
         if file_path.exists():
             yield from self._read_spatial_file(file_path)
 
+    def read_layer(self, label):
+        if self.cache is not None:
+            if not self.cache.is_cached(label):
+                return None
+            self.cache.touch(label)
+            if self.cache.is_empty(label):
+                return None
+        file_path = self._shapefile_path(label)
+        if file_path.exists():
+            return self.storage.read(file_path)
+
+    def is_cached(self, label):
+        if self.cache is None:
+            return self._shapefile_path(label).exists()
+        return self.cache.is_cached(label)
+
     def _parse_layers(self, file_path, external_labels, depth):
         for label in external_labels:
             if isinstance(label, dict):
@@ -34,41 +100,61 @@ class ShapefileParser:
                 yield from self._read_spatial_file(file_path, layer=label)
 
     def _read_spatial_file(self, file_path, **kwargs):
+        import fiona
         with fiona.open(file_path, 'r', **kwargs) as source:
+            bbox = projection.to_source(
+                self.bounding_box, source.crs_wkt, self.epsg
+            )
             with warnings.catch_warnings():
                 warnings.filterwarnings("ignore", category=RuntimeWarning)
-                for record in source.filter(bbox=self.bounding_box):
+                for record in source.filter(bbox=bbox):
                     yield record
         return
 
     def _parse_records(self, records, label):
-        for i, record in enumerate(records):
-            if self.verbose:
-                print(f"\rNumber of {label} records read: {i + 1}", end='')
+        count = 0
+        for count, record in enumerate(records, 1):
+            if self.verbose and count % 1000 == 0:
+                print(f"\rNumber of {label} records read: {count}", end='')
             yield record
-        return
+        if self.verbose:
+            print(f"\rNumber of {label} records read: {count}", end='')
 
     def write(self, shape):
-        geometry = shape.mapping
-        file_path = self._shapefile_path(shape.label)
-        with self.writer(file_path, geometry['type']) as sink:
-            sink.write(self._as_record(shape.depth, geometry))
-
-    def writer(self, file_path, geometry_type):
-        return fiona.open(
-            file_path, 'w',
-            schema=self._as_record('int', geometry_type),
-            driver='ESRI Shapefile', crs={'init': 'epsg:25833'}
-        )
+        empty = shape.geometry.is_empty
+        if self.cache is not None:
+            self.cache.invalidate(shape.label)
+        if not empty:
+            file_path = self._shapefile_path(shape.label)
+            self.storage.write(
+                file_path, shape.depth, shape.geometry, self.bounding_box[:2]
+            )
+        if self.cache is not None:
+            self.cache.commit(shape.label, empty)
 
     @staticmethod
-    def _depth_filter(depth_label, minimum_depth):
-        return lambda r: r['properties'][depth_label] >= minimum_depth
+    def _scan_plan(sources):
+        plan = {}
+        for label, external_labels, depth in sources:
+            for external_label in external_labels:
+                if isinstance(external_label, dict):
+                    table = external_label['layer']
+                    _, filtered = plan.setdefault(table, ([], {}))
+                    depths, labels = filtered.setdefault(
+                        external_label['depth'], ([], [])
+                    )
+                    i = bisect_right(depths, depth)
+                    depths.insert(i, depth)
+                    labels.insert(i, label)
+                else:
+                    plan.setdefault(external_label, ([], {}))[0].append(label)
+        return plan
 
     @staticmethod
-    def _as_record(depth, geometry):
-        return {'properties': {'depth': depth}, 'geometry': geometry}
+    def _depth_filter(depth_label, minimum_depth):
+        return lambda r: r['properties'][depth_label] >= minimum_depth
 
-    @staticmethod
-    def _shapefile_path(label):
-        return path.shapefiles / label / (label + '.shp')
+    def _shapefile_path(self, label):
+        if self.cache is not None:
+            return self.cache.layer_path(label, self.storage.suffix)
+        return path.shapefiles / label / (label + self.storage.suffix)
@@ -11,6 +11,9 @@ config_schema = package / 'config_schema.yaml'
 data = root / 'data'
 external = data / 'external'
 shapefiles = data / 'shapefiles'
+tiles = data / 'tiles'
+snapshots = data / 'snapshots'
+rasters = data / 'rasters'
 
 vessels = data / 'vessels.csv'
 
@@ -0,0 +1,102 @@
+"""Contains helpers for measuring the resource usage of chart processing."""
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+import shapely
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def peak_rss():
+    """Returns the peak resident set size in MB of this process or any worker.
+
+    Returns None on platforms without the resource module, such as Windows.
+    """
+    if resource is None:
+        return None
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    unit = 1 if sys.platform == 'darwin' else 2 ** 10
+    return peak * unit / 2 ** 20
+
+
+def count_vertices(geometry):
+    """Returns the number of coordinates of a geometry or array of geometries."""
+    if geometry is None:
+        return None
+    return int(shapely.get_num_coordinates(geometry).sum())
+
+
+class Stage:
+    """A single timed processing stage of one layer."""
+
+    def __init__(self, layer, name, records=None, geometry=None, **extra):
+        self.entry = dict(
+            layer=layer, stage=name, records=records,
+            vertices_in=count_vertices(geometry), vertices_out=None, **extra
+        )
+
+    def output(self, geometry) -> None:
+        self.entry['vertices_out'] = count_vertices(geometry)
+
+
+class _DisabledStage(Stage):
+    def __init__(self):
+        self.entry = {}
+
+    def output(self, geometry) -> None:
+        pass
+
+
+class Profile:
+    """Records the cost of each ingestion stage of each layer.
+
+    Profiles are plain data, so a worker process may fill in a child profile
+    and return it to be merged into the profile of the load that started it.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = []
+        self.start_time = time.perf_counter()
+
+    @contextmanager
+    def stage(self, layer, name, records=None, geometry=None, **extra):
+        if not self.enabled:
+            yield _DisabledStage()
+            return
+        stage = Stage(layer, name, records, geometry, **extra)
+        wall_time, cpu_time = time.perf_counter(), time.process_time()
+        yield stage
+        stage.entry.update(
+            wall_time=time.perf_counter() - wall_time,
+            cpu_time=time.process_time() - cpu_time,
+            peak_rss=peak_rss(),
+        )
+        self.stages.append(stage.entry)
+
+    def child(self):
+        return Profile(self.enabled)
+
+    def merge(self, other) -> None:
+        self.stages.extend(other.stages)
+
+    def report(self, **context) -> dict:
+        return dict(
+            context,
+            wall_time=time.perf_counter() - self.start_time,
+            peak_rss=peak_rss(),
+            stages=self.stages,
+        )
+
+    def write(self, file_path, **context) -> None:
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(file_path, 'w', encoding='utf-8') as report_file:
+            json.dump(self.report(**context), report_file, indent=2)
@@ -0,0 +1,68 @@
+"""Contains the reprojection of source geometries into the chart CRS.
+
+Fiona and pyproj are imported on first use, as only parsing source data
+needs them.
+"""
+from functools import lru_cache, partial
+
+import numpy as np
+import shapely
+
+
+@lru_cache(maxsize=None)
+def source_crs(file_path: str, table: str):
+    """Returns the CRS of a table of a source database, if it has one."""
+    import fiona
+    with fiona.open(file_path, 'r', layer=table) as source:
+        return source.crs_wkt or None
+
+
+@lru_cache(maxsize=None)
+def transformer(source_wkt, epsg: int):
+    """Returns a transformer from a source CRS to the chart CRS.
+
+    Returns None if the source has no CRS or already is in the chart CRS.
+    Transformers are cached per process, as constructing one is expensive.
+    """
+    if source_wkt is None:
+        return None
+    from pyproj import CRS, Transformer
+    source, target = CRS.from_wkt(source_wkt), CRS.from_epsg(epsg)
+    if source == target:
+        return None
+    return Transformer.from_crs(source, target, always_xy=True)
+
+
+def reprojection(file_path, table: str, epsg: int):
+    """Returns a function reprojecting geometry arrays from a table of a source
+    database, whose tables may each have their own CRS."""
+    projection = transformer(source_crs(str(file_path), table), epsg)
+    if projection is None:
+        return None
+    return partial(reproject, projection=projection)
+
+
+def reproject(geometries, projection):
+    """Transforms all coordinates of an array of geometries in a single call."""
+    def transform(xy):
+        return np.column_stack(projection.transform(xy[:, 0], xy[:, 1]))
+    return shapely.transform(geometries, transform)
+
+
+def to_source(bbox, source_wkt, epsg: int):
+    """Returns a chart CRS bounding box as one covering it in the source CRS."""
+    projection = transformer(source_wkt or None, epsg)
+    if projection is None:
+        return bbox
+    from pyproj.enums import TransformDirection
+    return projection.transform_bounds(
+        *bbox, direction=TransformDirection.INVERSE
+    )
+
+
+def from_source(bbox, source_wkt, epsg: int):
+    """Returns a source CRS bounding box as one covering it in the chart CRS."""
+    projection = transformer(source_wkt or None, epsg)
+    if projection is None:
+        return bbox
+    return projection.transform_bounds(*bbox)
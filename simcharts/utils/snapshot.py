@@ -0,0 +1,139 @@
+"""Contains the warm-start snapshot of a fully loaded chart environment."""
+import hashlib
+import io
+import json
+import os
+import pickle
+import struct
+
+import numpy as np
+import shapely
+from shapely.geometry.base import BaseGeometry
+
+from . import cache
+from . import paths as path
+
+# Bump whenever the snapshot layout changes.
+SNAPSHOT_VERSION = 1
+
+MAGIC = b'SIMCHART'
+# Magic, version, geometry count, WKB blob length and object stream length.
+HEADER = struct.Struct('<8sIQQQ')
+# Number of snapshots kept, most recently written first.
+KEEP = 4
+
+
+class Snapshot:
+    """A single binary file holding the processed objects of an environment.
+
+    Objects are pickled with every geometry replaced by a reference into one
+    contiguous block of WKB, which is memory-mapped on load and decoded by
+    Shapely in a single call. The file name hashes the 'enc' settings, the
+    source files and the pipeline and snapshot versions, so any change to the
+    configuration or sources leads to a different snapshot. The name is
+    hashed when the snapshot is created, from the settings as configured.
+    """
+
+    def __init__(self, settings: dict):
+        inputs = dict(
+            version=SNAPSHOT_VERSION,
+            pipeline=cache.PIPELINE_VERSION,
+            settings={k: v for k, v in settings.items() if k != 'new_data'},
+            sources=[cache.source_identity(f) for f in settings['files']],
+        )
+        digest = hashlib.sha256(
+            json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')
+        )
+        self.key = digest.hexdigest()[:20]
+
+    @property
+    def file_path(self):
+        return path.snapshots / f'{self.key}.snapshot'
+
+    def load(self):
+        """Returns the objects stored for the current inputs, or None if there
+        are none or they can no longer be read."""
+        if not self.file_path.exists():
+            return None
+        try:
+            return self._read()
+        except Exception:
+            self.file_path.unlink(missing_ok=True)
+            return None
+
+    def save(self, objects) -> None:
+        geometries = []
+        stream = io.BytesIO()
+        _Pickler(stream, geometries).dump(objects)
+        blobs = shapely.to_wkb(np.array(geometries, dtype=object))
+        offsets = np.zeros(len(blobs) + 1, dtype=np.uint64)
+        offsets[1:] = np.cumsum([len(b) for b in blobs], dtype=np.uint64)
+        objects_bytes = stream.getvalue()
+
+        path.snapshots.mkdir(parents=True, exist_ok=True)
+        temporary = self.file_path.with_name(self.file_path.name + '.tmp')
+        with open(temporary, 'wb') as snapshot_file:
+            snapshot_file.write(HEADER.pack(
+                MAGIC, SNAPSHOT_VERSION, len(blobs), int(offsets[-1]),
+                len(objects_bytes),
+            ))
+            snapshot_file.write(offsets.tobytes())
+            for blob in blobs:
+                snapshot_file.write(blob)
+            snapshot_file.write(objects_bytes)
+        os.replace(temporary, self.file_path)
+        self._evict()
+
+    def _read(self):
+        buffer = np.memmap(self.file_path, dtype=np.uint8, mode='r')
+        magic, version, count, blob_size, objects_size = HEADER.unpack(
+            buffer[:HEADER.size].tobytes()
+        )
+        if magic != MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot {self.file_path}.")
+        start = HEADER.size
+        offsets = np.frombuffer(
+            buffer, dtype=np.uint64, count=count + 1, offset=start
+        ).astype(np.int64)
+        start += offsets.nbytes
+        blobs = buffer[start:start + blob_size]
+        wkb = np.array(
+            [blobs[a:b].tobytes() for a, b in zip(offsets[:-1], offsets[1:])],
+            dtype=object,
+        )
+        geometries = shapely.from_wkb(wkb) if count else []
+        start += blob_size
+        objects = buffer[start:start + objects_size].tobytes()
+        return _Unpickler(io.BytesIO(objects), geometries).load()
+
+    def _evict(self) -> None:
+        snapshots = sorted(
+            path.snapshots.glob('*.snapshot'),
+            key=lambda f: f.stat().st_mtime, reverse=True,
+        )
+        for old in snapshots[KEEP:]:
+            old.unlink(missing_ok=True)
+
+
+class _Pickler(pickle.Pickler):
+    def __init__(self, file, geometries):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.geometries = geometries
+        self.indices = {}
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, BaseGeometry):
+            return None
+        if id(obj) not in self.indices:
+            self.indices[id(obj)] = len(self.geometries)
+            self.geometries.append(obj)
+        return self.indices[id(obj)]
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file, geometries):
+        super().__init__(file)
+        self.geometries = geometries
+
+    def persistent_load(self, pid):
+        return self.geometries[pid]
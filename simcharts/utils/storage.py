@@ -0,0 +1,188 @@
+"""Contains the storage backends used to cache processed chart layers on disk."""
+import json
+import warnings
+
+from shapely import geometry as geo
+from shapely import wkb
+
+from . import compact as codec
+
+
+class ShapefileStorage:
+    """Stores each layer as a single-record ESRI Shapefile."""
+
+    suffix = '.shp'
+
+    def __init__(self, epsg: int, compression: str = 'none',
+                 compact: bool = False):
+        if compact:
+            raise ValueError(
+                "Compact coordinates require the 'arrow' or 'parquet' "
+                "cache format."
+            )
+        self.epsg = epsg
+
+    def write(self, file_path, depth, geometry, origin=None):
+        import fiona
+        mapping = geo.mapping(geometry)
+        with fiona.open(
+            file_path, 'w',
+            schema=self._as_record('int', mapping['type']),
+            driver='ESRI Shapefile', crs={'init': f'epsg:{self.epsg}'}
+        ) as sink:
+            sink.write(self._as_record(depth, mapping))
+
+    def read(self, file_path):
+        import fiona
+        with fiona.open(file_path, 'r') as source:
+            with warnings.catch_warnings():
+                warnings.filterwarnings("ignore", category=RuntimeWarning)
+                for record in source:
+                    return geo.shape(record['geometry'])
+
+    @staticmethod
+    def _as_record(depth, geometry):
+        return {'properties': {'depth': depth}, 'geometry': geometry}
+
+
+class ArrowStorage:
+    """Stores each layer as an Arrow IPC table with a WKB geometry column.
+
+    Uncompressed files are memory-mapped on read, so the geometry buffer is
+    handed to Shapely without an intermediate copy through Python records.
+
+    Compact tables instead store polygons as float32 offsets from an origin
+    kept in the table metadata, with their ragged ring, polygon and part
+    offsets, see simcharts.utils.compact for the precision this retains.
+    """
+
+    suffix = '.arrow'
+
+    def __init__(self, epsg: int, compression: str = 'none',
+                 compact: bool = False):
+        self.epsg = epsg
+        self.compression = None if compression == 'none' else compression
+        self.compact = compact
+        _import_pyarrow()
+
+    def write(self, file_path, depth, geometry, origin=None):
+        pa = _import_pyarrow()
+        table = self._as_table(depth, geometry, origin)
+        options = pa.ipc.IpcWriteOptions(compression=self.compression)
+        with pa.OSFile(str(file_path), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+
+    def read(self, file_path):
+        pa = _import_pyarrow()
+        with pa.memory_map(str(file_path), 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+            return self._from_table(table)
+
+    def _as_table(self, depth, geometry, origin=None):
+        pa = _import_pyarrow()
+        if self.compact:
+            origin = origin or codec.origin_of(geometry)
+            packed = codec.pack(geometry, origin)
+            if packed is not None:
+                return self._as_compact_table(depth, packed, origin)
+        metadata = {'geo': json.dumps(self._geo_metadata(geometry))}
+        return pa.table({
+            'depth': pa.array([depth], pa.int32()),
+            'geometry': pa.array([wkb.dumps(geometry)], pa.binary()),
+        }).replace_schema_metadata(metadata)
+
+    def _as_compact_table(self, depth, packed, origin):
+        pa = _import_pyarrow()
+        geometry_type, offsets, ragged = packed
+        metadata = {'compact': json.dumps({
+            'origin': list(origin), 'geometry_type': geometry_type,
+            'epsg': self.epsg,
+        })}
+        return pa.table({
+            'depth': pa.array([depth], pa.int32()),
+            'offsets': pa.array([offsets.ravel()], pa.list_(pa.float32())),
+            'ragged': pa.array(
+                [[o.tolist() for o in ragged]], pa.list_(pa.list_(pa.int64()))
+            ),
+        }).replace_schema_metadata(metadata)
+
+    def _geo_metadata(self, geometry):
+        return {
+            'version': '1.0.0',
+            'primary_column': 'geometry',
+            'columns': {'geometry': {
+                'encoding': 'WKB',
+                'geometry_types': [geometry.geom_type],
+                'crs': _projjson(self.epsg),
+                'bbox': list(geometry.bounds),
+            }},
+        }
+
+    @staticmethod
+    def _from_table(table):
+        metadata = table.schema.metadata or {}
+        if b'compact' in metadata:
+            return ArrowStorage._from_compact_table(
+                table, json.loads(metadata[b'compact'])
+            )
+        column = table.column('geometry')
+        if len(column) == 0:
+            return None
+        return wkb.loads(column[0].as_py())
+
+    @staticmethod
+    def _from_compact_table(table, metadata):
+        column = table.column('offsets')
+        if len(column) == 0:
+            return None
+        offsets = column.chunk(0).values.to_numpy()
+        ragged = table.column('ragged')[0].as_py()
+        return codec.unpack(
+            metadata['geometry_type'], offsets, ragged, metadata['origin']
+        )
+
+
+class ParquetStorage(ArrowStorage):
+    """Stores each layer as a GeoParquet file with a WKB geometry column."""
+
+    suffix = '.parquet'
+
+    def write(self, file_path, depth, geometry, origin=None):
+        import pyarrow.parquet as pq
+        table = self._as_table(depth, geometry, origin)
+        pq.write_table(
+            table, str(file_path), compression=self.compression or 'none'
+        )
+
+    def read(self, file_path):
+        import pyarrow.parquet as pq
+        table = pq.read_table(str(file_path), memory_map=True)
+        return self._from_table(table)
+
+
+backends = {
+    'shapefile': ShapefileStorage,
+    'arrow': ArrowStorage,
+    'parquet': ParquetStorage,
+}
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError as error:
+        raise ImportError(
+            "The 'arrow' and 'parquet' cache formats require pyarrow, "
+            "install it or set 'cache_format' to 'shapefile'."
+        ) from error
+    return pyarrow
+
+
+def _projjson(epsg):
+    try:
+        from pyproj import CRS
+        return CRS.from_epsg(epsg).to_json_dict()
+    except (ImportError, RuntimeError):
+        return None
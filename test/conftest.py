@@ -0,0 +1,210 @@
+import types
+
+import numpy as np
+import pytest
+import yaml
+from shapely import geometry as geo
+
+# Loads simcharts.spatial through the environment, which it imports in turn.
+import simcharts.environment  # noqa: F401
+import simcharts.utils as utils
+
+# Lower left corner and size of the synthetic source database, in UTM zone 32.
+ORIGIN = (569000.0, 7034000.0)
+SIZE = 2000.0
+# Extent of the synthetic chart of the 'chart' fixture.
+FRAME = geo.box(0, 0, 100, 100)
+
+
+def _source_tables():
+    """Features of each table of the synthetic source database, relative to
+    its origin, as (geometry, properties) pairs.
+
+    Depth areas lie in bands of 0, 5, 10 and 20 m from a coast in the west,
+    around an island with shallows, and are split into several features each.
+    Land holds a self-intersecting bowtie, as found in real databases.
+    """
+    island = geo.Point(1200, 1200).buffer(150)
+    shallows = geo.Point(1200, 1200).buffer(250)
+    bands = {
+        0.0: geo.box(300, 0, 700, 2000).union(shallows.difference(island)),
+        5.0: geo.box(700, 0, 1100, 2000).difference(shallows),
+        10.0: geo.box(1100, 0, 1500, 2000).difference(shallows),
+        20.0: geo.box(1500, 0, 2000, 2000).difference(shallows),
+    }
+    halves = [geo.box(0, 0, 2000, 1000), geo.box(0, 1000, 2000, 2000)]
+    bowtie = geo.Polygon(
+        [(1600, 300), (1700, 400), (1700, 300), (1600, 400), (1600, 300)]
+    )
+    return {
+        'dybdeareal': [
+            (band.intersection(half), {'minimumsdybde': depth})
+            for depth, band in bands.items() for half in halves
+        ],
+        'grunne': [
+            (geo.box(1700, 1500, 1750, 1550), {'dybde': 3.0}),
+            (geo.box(1300, 300, 1350, 350), {'dybde': 12.0}),
+        ],
+        'landareal': [
+            (geo.box(0, 0, 300, 1000), {}), (geo.box(0, 1000, 300, 2000), {}),
+            (island, {}), (bowtie, {}),
+        ],
+        'skjer': [
+            (geo.Point(500, 500).buffer(10), {}),
+            (geo.Point(900, 1500).buffer(8), {}),
+        ],
+        'torrfall': [
+            (geo.box(300, y, 340, y + 800), {}) for y in (0, 800, 1600)
+        ],
+        'ikkekartlagtsjomaltomr': [(geo.box(1900, 1900, 2000, 2000), {})],
+    }
+
+
+@pytest.fixture(scope='session')
+def gdb_dir(tmp_path_factory):
+    """A directory holding the synthetic source database 'chart.gdb'."""
+    import fiona
+    from shapely import affinity
+
+    directory = tmp_path_factory.mktemp('external')
+    for table, features in _source_tables().items():
+        properties = {k: 'float' for k in features[0][1]}
+        schema = {'geometry': 'MultiPolygon', 'properties': properties}
+        with fiona.open(
+            directory / 'chart.gdb', 'w', driver='OpenFileGDB', layer=table,
+            schema=schema
+        ) as sink:
+            for geometry, values in features:
+                geometry = affinity.translate(geometry, *ORIGIN)
+                if isinstance(geometry, geo.Polygon):
+                    geometry = geo.MultiPolygon([geometry])
+                sink.write({
+                    'geometry': geo.mapping(geometry), 'properties': values
+                })
+    return directory
+
+
+class _SourceDatabase:
+    """Settings and scopes for charts of the synthetic source database."""
+
+    origin = ORIGIN
+
+    def settings(self, **enc) -> dict:
+        with open(utils.paths.config, encoding='utf-8') as config:
+            settings = yaml.safe_load(config)
+        settings['enc'].pop('center', None)
+        settings['enc'].update(
+            utm_zone=32, size=[SIZE, SIZE], origin=list(ORIGIN), buffer=0,
+            tolerance=0, layers=['seabed', 'land', 'shore'],
+            depths=[0, 5, 10, 20], files=['chart.gdb'], new_data=True,
+            raw_data=False, verbose=False, workers=1, lazy_depths=False,
+            depth_bands=False, memory_limit=0, cell_size=0,
+            incremental=False, profile=False, cache_format='shapefile',
+            cache_compression='none', tiles=False, snapshot=False,
+            compact_coordinates=False,
+        )
+        settings['enc'].update(enc)
+        return settings
+
+    def scope(self, **enc):
+        from simcharts.environment.extent import Extent
+        from simcharts.environment.scope import Scope
+
+        settings = self.settings(**enc)
+        return Scope(settings, Extent(settings))
+
+    def load(self, **enc) -> dict:
+        """Loads every layer, and returns their geometries by label."""
+        import simcharts.spatial as spl
+
+        scope = self.scope(**enc)
+        layers = spl.Hydrography(scope).layers + spl.Topography(scope).layers
+        return {x.label: x.geometry for x in layers}
+
+
+@pytest.fixture
+def gdb(data_dir, gdb_dir, monkeypatch):
+    """The synthetic source database, read from a temporary directory."""
+    monkeypatch.setattr(utils.paths, 'external', gdb_dir)
+    monkeypatch.setattr(
+        utils.files, 'build_directory_structure', lambda features=None: None
+    )
+    return _SourceDatabase()
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Redirects the generated data directories into a temporary one."""
+    for name in ('shapefiles', 'tiles', 'snapshots', 'rasters', 'reports'):
+        monkeypatch.setattr(utils.paths, name, tmp_path / name)
+    monkeypatch.setattr(
+        utils.cache, 'source_identity', lambda file_name: [file_name, 0, 0]
+    )
+    return tmp_path
+
+
+@pytest.fixture(scope='module')
+def chart():
+    """A query over a synthetic chart of 100 by 100 meters, with a coast to
+    the west, an island, and Seabed layers 0, 5 and 10 m deep, the deepest
+    with a shallow pocket."""
+    from simcharts.spatial import ChartQuery
+    from simcharts.spatial.layers import Land, Seabed, Shore
+
+    def multi(geometry):
+        if isinstance(geometry, geo.Polygon):
+            return geo.MultiPolygon([geometry])
+        return geometry
+
+    island = geo.Point(60, 60).buffer(8)
+    land, shore = Land(), Shore()
+    land.geometry = geo.box(0, 0, 10, 100).union(island)
+    shore.geometry = geo.box(10, 0, 14, 100).union(
+        geo.Point(60, 60).buffer(10).difference(island)
+    )
+    areas = {
+        0: FRAME.difference(land.geometry).difference(shore.geometry),
+        5: geo.box(35, 0, 100, 100).difference(geo.Point(60, 60).buffer(14)),
+        10: geo.box(55, 0, 100, 100).difference(
+            geo.Point(60, 60).buffer(20)
+        ).difference(geo.box(85, 10, 95, 20)),
+    }
+    bathymetry = {}
+    for depth, area in areas.items():
+        bathymetry[depth] = Seabed(depth)
+        bathymetry[depth].geometry = multi(area)
+    for layer in (land, shore):
+        layer.geometry = multi(layer.geometry)
+    hydrography = types.SimpleNamespace(bathymetry=bathymetry)
+    topography = types.SimpleNamespace(
+        land=land, shore=shore, layers=[land, shore]
+    )
+    return ChartQuery(hydrography, topography, FRAME.bounds)
+
+
+def random_points(count, seed=0):
+    """Random points within the frame of the 'chart' fixture."""
+    return np.random.default_rng(seed).uniform(0, 100, (count, 2))
+
+
+def water_of(chart, depth):
+    """The water of a chart at least a depth deep, off land and shore."""
+    seabed = chart.hydrography.bathymetry[chart.depths[chart.bin_of(depth)]]
+    area = seabed.geometry
+    for layer in chart.topography.layers:
+        area = area.difference(layer.geometry)
+    return area
+
+
+def hazards_of(chart, depth):
+    """Land, shore and water shallower than a depth, within the frame."""
+    return FRAME.difference(water_of(chart, depth))
+
+
+def grid_cells(shape, resolution):
+    """The row, column and box of each cell of a grid from the origin."""
+    rows, columns = shape
+    for row in range(rows):
+        for column in range(columns):
+            x, y = column * resolution, row * resolution
+            yield row, column, geo.box(x, y, x + resolution, y + resolution)
@@ -0,0 +1,91 @@
+import shapely
+
+import simcharts.utils as utils
+
+BBOX = (0.0, 0.0, 1000.0, 1000.0)
+
+
+def _cache(tolerance=0, buffer=5, **kwargs):
+    return utils.cache.ChartCache(
+        BBOX, ['source.gdb'], buffer, tolerance, False, 1, **kwargs
+    )
+
+
+def test_key_depends_on_partitioning_when_simplifying(data_dir):
+    keys = [
+        _cache(2, **kwargs).key('land') for kwargs in (
+            {}, dict(cell_size=500), dict(cell_size=1000),
+            dict(memory_limit=100), dict(memory_limit=100, workers=2),
+        )
+    ]
+    assert len(set(keys)) == len(keys)
+
+
+def test_key_ignores_partitioning_of_exact_merges(data_dir):
+    keys = {
+        _cache(0, **kwargs).key('land') for kwargs in (
+            {}, dict(cell_size=500), dict(memory_limit=100, workers=2),
+        )
+    }
+    assert len(keys) == 1
+
+
+def test_other_buffers_reuse_the_unbuffered_stage(data_dir):
+    cache = _cache(2)
+    square = shapely.box(0, 0, 10, 10)
+    for stage in utils.cache.STAGES:
+        cache.save_stage('land', stage, square.buffer(len(stage)))
+    cache.commit('land')
+    stages = cache.entry('land') / utils.cache.STAGES_DIR
+    assert [f.name for f in stages.iterdir()] == ['simplify.wkb']
+    unbuffered = _cache(2, buffer=20).unbuffered('land')
+    assert unbuffered.equals(square.buffer(len('simplify')))
+    assert _cache(1, buffer=20).unbuffered('land') is None
+    assert _cache(2, buffer=20).unbuffered('shore') is None
+
+
+def _commit(cache, label, size, last_used, monkeypatch):
+    monkeypatch.setattr(utils.cache.time, 'time', lambda: last_used)
+    cache.layer_path(label, '.bin').write_bytes(bytes(size))
+    cache.commit(label)
+
+
+def test_least_recently_used_entries_are_evicted(data_dir, monkeypatch):
+    cache = _cache()
+    size = 300 * 2 ** 10
+    for last_used, label in enumerate(('land', 'shore', 'seabed0m')):
+        _commit(cache, label, size, last_used, monkeypatch)
+    _commit(cache, 'seabed5m', size, 3, monkeypatch)
+    cache.evict(['seabed5m'])
+    cached = ['shore', 'seabed0m', 'seabed5m']
+    assert not cache.is_cached('land')
+    assert all(cache.is_cached(x) for x in cached)
+
+    monkeypatch.setattr(utils.cache.time, 'time', lambda: 5)
+    cache.touch('shore')
+    _commit(cache, 'seabed10m', size, 6, monkeypatch)
+    cache.evict(['seabed10m', 'seabed0m'])
+    assert not cache.is_cached('seabed5m')
+    assert all(cache.is_cached(x) for x in ('shore', 'seabed0m', 'seabed10m'))
+
+
+def test_interrupted_run_resumes_from_its_checkpoints(data_dir):
+    labels = ['land', 'shore', 'seabed0m']
+    square = shapely.box(0, 0, 10, 10)
+    cache = _cache()
+    assert cache.begin(labels) == []
+    cache.layer_path('land', '.bin').write_bytes(b'land')
+    cache.commit('land')
+    cache.save_stage('shore', 'union', square)
+    cache.save_stage('shore', 'simplify', square.buffer(1))
+
+    cache = _cache()
+    assert cache.begin(labels) == ['land']
+    stage, geometry = cache.restore_stage('shore')
+    assert stage == 'simplify' and geometry.equals(square.buffer(1))
+    assert cache.restore_stage('seabed0m') == (None, None)
+    cache.end()
+
+    cache = _cache()
+    assert cache.begin(labels) == []
+    assert cache.restore_stage('shore') == (None, None)
@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+import yaml
+
+import simcharts.environment.environment as environment
+import simcharts.utils as utils
+
+
+class _Topography:
+
+    def __init__(self, scope):
+        self.scope = scope
+
+
+class _Failure:
+
+    def __init__(self, scope):
+        raise OSError('unreadable chart')
+
+
+def _settings():
+    with open(utils.paths.config, encoding='utf-8') as config:
+        settings = yaml.safe_load(config)
+    settings['enc'].update(files=['chart.gdb'], snapshot=False, verbose=False)
+    return settings
+
+
+def test_failed_load_releases_waiting_threads(data_dir, monkeypatch):
+    monkeypatch.setattr(environment.spl, 'Topography', _Topography)
+    monkeypatch.setattr(environment.spl, 'Hydrography', _Failure)
+    monkeypatch.setattr(
+        utils.files, 'build_directory_structure', lambda features=None: None
+    )
+    chart = environment.Environment(_settings(), defer=True)
+    assert chart.error is None and not chart.wait('hydrography', 0)
+
+    def load():
+        with pytest.raises(OSError):
+            chart.load(order=('topography', 'hydrography'))
+
+    loader = threading.Thread(target=load)
+    loader.start()
+    assert not chart.wait('hydrography', 10)
+    assert chart.wait('topography', 0)
+    loader.join()
+    assert isinstance(chart.error, OSError) and not chart.loaded
+
+
+def test_config_without_optional_keys_uses_the_defaults(gdb, tmp_path):
+    optional = ['workers', 'cache_format', 'tile_levels', 'path_clearance']
+    settings = gdb.settings(workers=3)
+    for key in optional:
+        settings['enc'].pop(key)
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text(yaml.safe_dump(settings), encoding='utf-8')
+    defaults = utils.config.read_yaml_into_dict()['enc']
+    parsed = utils.config.SeaChartsConfig(config_path, workers=2).settings
+    assert parsed['enc']['workers'] == 2
+    for key in optional[1:]:
+        assert parsed['enc'][key] == defaults[key], key
+    settings['enc'].pop('utm_zone')
+    config_path.write_text(yaml.safe_dump(settings), encoding='utf-8')
+    with pytest.raises(ValueError, match='utm_zone'):
+        utils.config.SeaChartsConfig(config_path)
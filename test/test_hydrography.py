@@ -0,0 +1,120 @@
+import pickle
+import shutil
+import threading
+import time
+
+import shapely
+from shapely import geometry as geo
+
+from simcharts.spatial.hypsometry import Bathymetry, DepthBands
+from simcharts.spatial.layers import Seabed
+
+DEPTHS = [0, 5, 10, 20]
+
+
+class _Loader:
+    """Records each load, and fails if two of them overlap."""
+
+    def __init__(self):
+        self.calls = []
+        self._active = threading.Lock()
+
+    def __call__(self, layers):
+        assert self._active.acquire(blocking=False), 'concurrent loads'
+        try:
+            time.sleep(0.01)
+            for layer in layers:
+                layer.geometry = geo.box(0, 0, 100 - layer.depth, 100)
+            self.calls.append(sorted(x.depth for x in layers))
+        finally:
+            self._active.release()
+
+
+def test_depths_load_on_first_lookup_only():
+    loader = _Loader()
+    bathymetry = Bathymetry(DEPTHS, loader, lambda layer: True)
+    assert list(bathymetry) == DEPTHS and bathymetry.loaded == []
+    assert bathymetry[10].geometry.bounds == (0, 0, 90, 100)
+    bathymetry[10]
+    assert loader.calls == [[10]] and bathymetry.loaded == [10]
+
+
+def test_unstored_depths_load_together():
+    loader = _Loader()
+    bathymetry = Bathymetry(DEPTHS, loader, lambda layer: layer.depth != 5)
+    bathymetry[20]
+    bathymetry[0]
+    assert loader.calls == [[20], [0]]
+    bathymetry = Bathymetry(DEPTHS, loader, lambda layer: False)
+    bathymetry[5]
+    assert loader.calls[-1] == DEPTHS and bathymetry.loaded == DEPTHS
+
+
+def test_prefetch_and_lookups_take_turns():
+    loader = _Loader()
+    bathymetry = Bathymetry(DEPTHS, loader, lambda layer: True)
+    threads = [bathymetry.prefetch()] + [
+        threading.Thread(target=bathymetry.__getitem__, args=(d,))
+        for d in reversed(DEPTHS)
+    ]
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(sum(loader.calls, [])) == DEPTHS
+
+
+def _seabeds():
+    """Nested seabed layers, with a deep hole and a pocket outside the next
+    shallower layer, as left by simplification."""
+    geometries = {
+        0: geo.box(0, 0, 100, 100),
+        5: geo.box(10, 0, 100, 100),
+        10: geo.box(20, 0, 100, 100).difference(geo.box(40, 40, 60, 60)),
+        20: geo.MultiPolygon([geo.box(30, 10, 90, 30), geo.box(15, 70, 25, 80)]),
+    }
+    layers = {}
+    for depth, geometry in geometries.items():
+        layers[depth] = Seabed(depth)
+        layers[depth].geometry = geometry
+    return layers
+
+
+def test_depth_bands_are_disjoint_and_cover_the_layers():
+    layers = _seabeds()
+    bands = DepthBands(layers).bands
+    for depth, layer in layers.items():
+        deeper = [g for d, g in bands.items() if d >= depth]
+        assert shapely.union_all(deeper).covers(layer.geometry)
+    for shallow in bands:
+        for deep in bands:
+            if shallow < deep:
+                overlap = bands[shallow].intersection(bands[deep])
+                assert overlap.area == 0
+
+
+def test_depth_bands_build_each_layer_once_from_the_bands():
+    layers = _seabeds()
+    bathymetry = DepthBands(layers)
+    assert list(bathymetry) == DEPTHS and bathymetry._layers == {}
+    held = bathymetry[10]
+    deeper = shapely.union_all([layers[10].geometry, layers[20].geometry])
+    assert held.depth == 10 and held.geometry.equals(deeper)
+    assert bathymetry[10] is held
+    restored = pickle.loads(pickle.dumps(bathymetry))
+    assert restored.bands.keys() == bathymetry.bands.keys()
+    assert restored[10].geometry.equals(held.geometry)
+
+
+def test_depth_bands_rebuild_evicted_layers_without_the_cache(gdb, data_dir):
+    import simcharts.spatial as spl
+
+    layers = gdb.load()
+    bathymetry = spl.Hydrography(gdb.scope(depth_bands=True)).bathymetry
+    shutil.rmtree(data_dir / 'shapefiles')
+    bathymetry._layers.clear()
+    for depth in reversed(DEPTHS):
+        layer = bathymetry[depth]
+        expected = layers[layer.label]
+        assert not layer.geometry.is_empty, depth
+        assert layer.geometry.symmetric_difference(expected).area < 1e-6
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+import shapely
+import yaml
+
+import simcharts.spatial as spl
+import simcharts.utils as utils
+from simcharts.environment.extent import Extent
+from simcharts.environment.scope import Scope
+from simcharts.spatial import hypsometry
+
+BBOX = (0.0, 0.0, 400.0, 400.0)
+# Land features of two editions of a source: 'b' moves, 'c' is removed and
+# 'd' added, while 'a' stays.
+EDITIONS = [
+    {
+        'a': shapely.box(20, 20, 80, 80),
+        'b': shapely.box(150, 150, 230, 210),
+        'c': shapely.box(300, 40, 360, 120),
+    },
+    {
+        'a': shapely.box(20, 20, 80, 80),
+        'b': shapely.box(160, 150, 240, 220),
+        'd': shapely.box(330, 300, 398, 390),
+    },
+]
+
+
+@pytest.fixture
+def source(data_dir, monkeypatch):
+    """A source whose edition is set by the test, read by a fake scan."""
+    edition = [0]
+
+    def scan(parser, sources, profile, manifest=None):
+        features = EDITIONS[edition[0]]
+        geometries = np.array(list(features.values()))
+        if manifest is not None:
+            manifest.add(
+                [f'chart.gdb/landareal/{k}' for k in features], geometries,
+                [{} for _ in features],
+            )
+        return {'land': geometries}
+
+    monkeypatch.setattr(hypsometry, '_scan', scan)
+    monkeypatch.setattr(
+        utils.cache, 'source_identity',
+        lambda file_name: [file_name, edition[0], 0],
+    )
+    monkeypatch.setattr(
+        utils.files, 'build_directory_structure', lambda features=None: None
+    )
+    return edition
+
+
+def _scope(new_data, **enc):
+    with open(utils.paths.config, encoding='utf-8') as config:
+        settings = yaml.safe_load(config)
+    settings['enc'].pop('center', None)
+    settings['enc'].update(
+        size=[400, 400], origin=[0, 0], buffer=2, tolerance=0,
+        layers=['land'], files=['chart.gdb'], new_data=new_data,
+        incremental=True, cell_size=100, memory_limit=0, workers=1,
+        tiles=False, raw_data=False, profile=False, verbose=False,
+        cache_format='shapefile', compact_coordinates=False,
+    )
+    settings['enc'].update(enc)
+    return Scope(settings, Extent(settings))
+
+
+def _spy(monkeypatch):
+    """Records the cells of every incremental update."""
+    affected, original = [], hypsometry._affected_cells
+
+    def affected_cells(*args):
+        cells = original(*args)
+        affected.extend(cells)
+        return cells
+
+    monkeypatch.setattr(hypsometry, '_affected_cells', affected_cells)
+    return affected
+
+
+def test_changed_cells_are_spliced_into_the_previous_layer(source,
+                                                           monkeypatch):
+    spl.Topography(_scope(new_data=True))
+    affected = _spy(monkeypatch)
+    source[0] = 1
+    land = spl.Topography(_scope(new_data=False)).land.geometry
+
+    assert affected and (0, 0) not in affected and (1, 1) in affected
+    expected = shapely.union_all(list(EDITIONS[1].values()))
+    expected = shapely.box(*BBOX).intersection(
+        expected.buffer(2, cap_style=2, join_style=3)
+    )
+    assert land.symmetric_difference(expected).area < 1e-6
+
+
+@pytest.mark.parametrize('cell_size', [0, 100])
+def test_simplified_layers_match_a_rebuild(source, monkeypatch, cell_size):
+    """Whole layers are simplified apart from cells, so without cells a
+    simplified layer is rebuilt rather than spliced."""
+    enc = dict(tolerance=2, cell_size=cell_size)
+    spl.Topography(_scope(new_data=True, **enc))
+    affected = _spy(monkeypatch)
+    source[0] = 1
+    updated = spl.Topography(_scope(new_data=False, **enc)).land.geometry
+    assert bool(affected) == (cell_size > 0)
+    rebuilt = spl.Topography(_scope(new_data=True, **enc)).land.geometry
+    assert shapely.normalize(updated).equals_exact(
+        shapely.normalize(rebuilt), 0
+    )
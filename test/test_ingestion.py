@@ -0,0 +1,110 @@
+import json
+
+import pytest
+import shapely
+
+from simcharts.spatial import hypsometry
+from simcharts.spatial.base import Layer
+from simcharts.spatial.layers import Land, Seabed, Shore
+
+
+@pytest.mark.parametrize('tolerance', [0, 2])
+def test_worker_processes_match_the_serial_load(gdb, tolerance):
+    serial = gdb.load(tolerance=tolerance)
+    parallel = gdb.load(tolerance=tolerance, workers=2)
+    assert list(parallel) == list(serial)
+    for label, geometry in serial.items():
+        assert not geometry.is_empty, label
+        assert parallel[label].equals(geometry), label
+
+
+def _layers(scope):
+    layers = [Seabed(d) for d in scope.depths] + [Land(), Shore()]
+    return [x for x in layers if x.label in scope.layers]
+
+
+def test_scan_reads_each_table_once_for_all_layers(gdb, monkeypatch):
+    scope = gdb.scope()
+    parser, reads = scope.parser, []
+    read = parser._read_spatial_file
+
+    def read_spatial_file(file_path, **kwargs):
+        reads.append(kwargs['layer'])
+        return read(file_path, **kwargs)
+
+    monkeypatch.setattr(parser, '_read_spatial_file', read_spatial_file)
+    layers = _layers(scope)
+    records = parser.scan_fgdb([x.source for x in layers])
+    assert sorted(reads) == sorted(set(reads)) and len(reads) == 6
+    for layer in layers:
+        expected = Layer.decode(list(parser.read_fgdb(*layer.source)))
+        scanned = Layer.decode(records[layer.label])
+        assert len(scanned) == len(expected) > 0
+        assert sorted(shapely.to_wkb(scanned)) == sorted(
+            shapely.to_wkb(expected)
+        )
+
+
+def _bowtie_lobes(x, y):
+    """The two triangles of a bowtie over the square of 100 m at x, y."""
+    return shapely.union_all([
+        shapely.Polygon([(x, y), (x + 50, y + 50), (x, y + 100)]),
+        shapely.Polygon([(x + 100, y), (x + 50, y + 50), (x + 100, y + 100)]),
+    ])
+
+
+def test_self_intersecting_ring_keeps_both_lobes(gdb):
+    record = {'geometry': {'type': 'Polygon', 'coordinates': [
+        [(0, 0), (100, 100), (100, 0), (0, 100), (0, 0)]
+    ]}}
+    geometry = Land.collect(Land.decode([record]))
+    assert geometry.is_valid and geometry.equals(_bowtie_lobes(0, 0))
+
+    land = gdb.load()['land']
+    x, y = gdb.origin[0] + 1600, gdb.origin[1] + 300
+    square = shapely.box(x, y, x + 100, y + 100)
+    lobes = land.intersection(square)
+    assert lobes.symmetric_difference(_bowtie_lobes(x, y)).area < 1e-6
+
+
+def test_streamed_chunks_merge_into_the_serial_layers(gdb, monkeypatch):
+    serial = gdb.load()
+    # Chunks of 16 points at a memory limit of 1 MB.
+    monkeypatch.setattr(hypsometry, '_POINT_COST', 2 ** 16)
+    chunks, split = [], hypsometry._chunks
+
+    def spy(records, max_points):
+        for chunk in split(records, max_points):
+            chunks.append(len(chunk))
+            yield chunk
+
+    monkeypatch.setattr(hypsometry, '_chunks', spy)
+    streamed = gdb.load(memory_limit=1)
+    assert len(chunks) > 2 * len(streamed) and min(chunks) == 1
+    for label, geometry in serial.items():
+        assert streamed[label].equals(geometry), label
+
+
+def test_profile_reports_every_stage_of_each_layer(gdb, data_dir):
+    layers = gdb.load(profile=True, tolerance=2)
+    reports = {}
+    for report_path in (data_dir / 'reports').glob('ingestion_*.json'):
+        with open(report_path, encoding='utf-8') as report_file:
+            report = json.load(report_file)
+        reports[report['hypsometry']] = report
+    assert sorted(reports) == ['Hydrography', 'Topography']
+    stages = {}
+    for report in reports.values():
+        assert report['mode'] == 'serial' and report['tolerance'] == 2
+        for stage in report['stages']:
+            assert stage['wall_time'] >= 0 and stage['cpu_time'] >= 0
+            stages.setdefault(stage['layer'], []).append(stage)
+    assert {s['stage'] for s in stages.pop('*')} == {'read', 'decode'}
+    assert sorted(stages) == sorted(layers)
+    for label, entries in stages.items():
+        names = [s['stage'] for s in entries]
+        assert names == ['union', 'simplify', 'buffer', 'clip', 'write']
+        union, simplify = entries[0], entries[1]
+        assert union['records'] > 0
+        assert simplify['vertices_in'] == union['vertices_out']
+        assert simplify['vertices_out'] <= simplify['vertices_in']
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import shapely
+
+import simcharts.utils as utils
+from simcharts.spatial import hypsometry
+from simcharts.spatial.layers import Shore
+
+fiona = pytest.importorskip('fiona')
+pyproj = pytest.importorskip('pyproj')
+
+EPSG = 25832
+# CRS of each source table, most of them unlike that of the first.
+TABLES = {'landareal': 25832, 'skjer': 4326, 'torrfall': 25833,
+          'ikkekartlagtsjomaltomr': 4326}
+
+
+@pytest.fixture
+def source(data_dir, monkeypatch):
+    """A database whose tables each hold one square in their own CRS."""
+    monkeypatch.setattr(utils.paths, 'external', data_dir)
+    squares = {}
+    for i, (table, epsg) in enumerate(TABLES.items()):
+        square = shapely.box(570000 + 200 * i, 7035000,
+                             570100 + 200 * i, 7035100)
+        squares[table] = square
+        transformer = pyproj.Transformer.from_crs(EPSG, epsg, always_xy=True)
+        geometry = shapely.transform(
+            square, lambda xy: np.column_stack(transformer.transform(*xy.T))
+        )
+        with fiona.open(
+            data_dir / 'mixed.gpkg', 'w', driver='GPKG', layer=table,
+            crs=fiona.crs.CRS.from_epsg(epsg),
+            schema={'geometry': 'Polygon', 'properties': {}},
+        ) as sink:
+            sink.write({'geometry': shapely.geometry.mapping(geometry),
+                        'properties': {}})
+    return squares
+
+
+def _parser():
+    return utils.ShapefileParser(
+        (569000, 7034000, 572000, 7036000), ['mixed.gpkg'], False, EPSG
+    )
+
+
+def _assert_squares(geometries, squares):
+    assert len(geometries) == len(squares)
+    for square in squares.values():
+        distances = shapely.hausdorff_distance(geometries, square)
+        assert distances.min() < 1e-3
+
+
+def test_scan_reprojects_each_table_from_its_own_crs(source):
+    profile = utils.profiling.Profile(enabled=False)
+    geometries = hypsometry._scan(_parser(), [Shore().source], profile)
+    _assert_squares(geometries['shore'], source)
+
+
+def test_stream_reprojects_each_table_from_its_own_crs(source):
+    chunks = hypsometry._stream(_parser(), Shore(), 10 ** 6, [])
+    _assert_squares(np.concatenate(list(chunks)), source)
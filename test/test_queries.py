@@ -0,0 +1,130 @@
+import numpy as np
+import shapely
+from shapely import geometry as geo
+
+from conftest import FRAME, hazards_of, random_points, water_of
+
+
+def test_on_land_and_depth_bins_match_the_polygons(chart):
+    points = random_points(500)
+    land = chart.topography.land.geometry
+    seabeds = [chart.hydrography.bathymetry[d] for d in chart.depths]
+    expected = [
+        max((i for i, x in enumerate(seabeds)
+             if x.geometry.contains(geo.Point(p))), default=-1)
+        for p in points
+    ]
+    assert chart.on_land(points).tolist() == [
+        land.contains(geo.Point(p)) for p in points
+    ]
+    assert chart.depth_bins(points).tolist() == expected
+    assert set(expected) == {-1, 0, 1, 2}
+
+
+def test_navigable_matches_the_water_of_each_depth(chart):
+    points = random_points(500, 1)
+    for depth in chart.depths:
+        water = water_of(chart, depth)
+        assert chart.navigable(points, depth).tolist() == [
+            water.contains(geo.Point(p)) for p in points
+        ]
+
+
+def test_nearest_hazards_match_the_distance_to_hazards(chart):
+    points = random_points(400, 2)
+    for depth in (0, 5, 10):
+        hazards = hazards_of(chart, depth)
+        expected = shapely.distance(hazards, shapely.points(points))
+        distances, nearest = chart.nearest_hazards(points, depth)
+        np.testing.assert_allclose(distances, expected, atol=1e-9)
+        reached = np.hypot(*(nearest - points).T)
+        np.testing.assert_allclose(reached, expected, atol=1e-9)
+        assert shapely.distance(hazards, shapely.points(nearest)).max() < 1e-9
+
+
+def test_nearest_hazards_beyond_max_distance_are_infinite(chart):
+    points = random_points(400, 3)
+    hazards = hazards_of(chart, 5)
+    expected = shapely.distance(hazards, shapely.points(points))
+    distances, nearest = chart.nearest_hazards(points, 5, max_distance=4)
+    far = expected > 4
+    assert far.any() and (~far).any()
+    assert np.isinf(distances[far]).all() and np.isnan(nearest[far]).all()
+    np.testing.assert_allclose(distances[~far], expected[~far], atol=1e-9)
+
+
+def _paths(count, seed=4):
+    """Random walks of one to six waypoints, with headings."""
+    rng = np.random.default_rng(seed)
+    paths = []
+    for size in rng.integers(1, 7, count):
+        steps = rng.normal(0, 8, (size, 2))
+        steps[0] = rng.uniform(20, 80, 2)
+        xy = np.clip(np.cumsum(steps, axis=0), 0.5, 99.5)
+        paths.append(np.column_stack((xy, rng.uniform(0, 360, size))))
+    return paths
+
+
+def _validate(chart, path, draft, clearance):
+    """Validates a path segment by segment."""
+    water, hazards = water_of(chart, draft), hazards_of(chart, draft)
+    stranded = [not water.contains(geo.Point(p)) for p in path[:, :2]]
+    if len(path) == 1:
+        shape = geo.Point(path[0, :2])
+    else:
+        shape = geo.LineString(path[:, :2])
+    distance = 0.0 if any(stranded) else hazards.distance(shape)
+    if distance > 0 and distance >= clearance:
+        return True, -1, distance
+    if len(path) == 1:
+        return False, 0, distance
+    for i in range(len(path) - 1):
+        segment = geo.LineString(path[i:i + 2, :2])
+        too_close = (segment.distance(hazards) <= clearance if clearance
+                     else segment.intersects(hazards))
+        if stranded[i] or stranded[i + 1] or too_close:
+            return False, i, distance
+
+
+def test_validate_paths_matches_segment_checks(chart):
+    paths = _paths(300)
+    for draft, clearance in ((0, 0.0), (5, 0.0), (5, 2.0), (10, 3.0)):
+        valid, first, clearances = chart.validate_paths(
+            paths, draft, clearance
+        )
+        expected = [_validate(chart, p, draft, clearance) for p in paths]
+        assert valid.tolist() == [e[0] for e in expected]
+        assert first.tolist() == [e[1] for e in expected]
+        np.testing.assert_allclose(
+            clearances, [e[2] for e in expected], atol=1e-9
+        )
+        assert valid.any() and (~valid).any()
+
+
+def test_validate_paths_accepts_empty_paths(chart):
+    valid, first, clearances = chart.validate_paths(
+        [np.empty((0, 2)), [[50.0, 30.0], [52.0, 31.0]]], 0
+    )
+    assert valid.tolist() == [True, True] and first.tolist() == [-1, -1]
+    assert np.isinf(clearances[0])
+
+
+def test_boundary_leaves_out_the_frame(chart):
+    for depth_bin, depth in enumerate(chart.depths):
+        tree = chart.boundary(depth_bin)
+        segments = shapely.union_all(tree.geometries)
+        assert not FRAME.exterior.covers(tree.geometries).any()
+        expected = water_of(chart, depth).boundary.difference(FRAME.exterior)
+        assert segments.symmetric_difference(expected).length < 1e-9
+
+
+def test_validate_paths_of_single_points(chart):
+    afloat, aground = [50.0, 30.0], [5.0, 50.0]
+    paths = [[afloat], [afloat, afloat], [aground], [aground, aground]]
+    valid, first, clearances = chart.validate_paths(paths, 5, 2.0)
+    clearance = hazards_of(chart, 5).distance(geo.Point(afloat))
+    assert valid.tolist() == [True, True, False, False]
+    assert first.tolist() == [-1, -1, 0, 0]
+    np.testing.assert_allclose(clearances, [clearance] * 2 + [0.0] * 2)
+    valid, first, _ = chart.validate_paths(paths[:2], 5, clearance + 1)
+    assert valid.tolist() == [False, False] and first.tolist() == [0, 0]
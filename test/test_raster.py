@@ -0,0 +1,67 @@
+import numpy as np
+
+from conftest import FRAME, grid_cells, hazards_of, water_of
+from simcharts.spatial import ChartRaster
+
+BBOX = FRAME.bounds
+RESOLUTION = 3.0
+
+
+def _coverage(layers, cell):
+    """Tells whether a single part of the layers covers a cell, and whether
+    any of them reaches into it."""
+    parts = [p for x in layers for p in x.geometry.geoms]
+    return (any(p.contains(cell) for p in parts),
+            any(p.intersects(cell) for p in parts))
+
+
+def test_channels_match_the_polygons(chart):
+    raster = ChartRaster.build(chart, BBOX, RESOLUTION, depth=5)
+    seabeds = [chart.hydrography.bathymetry[d] for d in chart.depths]
+    water, hazards = water_of(chart, 5), hazards_of(chart, 5)
+    assert raster.shape == (34, 34)
+    for row, column, cell in grid_cells(raster.shape, RESOLUTION):
+        covered, reached = _coverage(chart.topography.layers, cell)
+        assert raster.land[row, column] == (2 if covered else int(reached))
+        bins = [_coverage([x], cell) for x in seabeds]
+        shallowest = max((i for i, b in enumerate(bins) if b[0]), default=-1)
+        deepest = max((i for i, b in enumerate(bins) if b[1]), default=-1)
+        assert raster.shallowest[row, column] == shallowest
+        assert raster.deepest[row, column] == deepest
+        center = cell.intersection(FRAME).centroid
+        if water.contains(center):
+            distance = hazards.distance(center)
+        else:
+            distance = -water.distance(center)
+        assert abs(raster.distance[row, column] - distance) < 1e-3
+
+
+def _edges():
+    """Points on the edges of the grid cells, including the frame of the
+    chart, and beyond it in the last, partial row and column."""
+    edges = np.append(np.arange(0.0, 100.0, RESOLUTION), [100.0, 101.5])
+    return np.stack(np.meshgrid(edges, edges), axis=-1).reshape(-1, 2)
+
+
+def test_cells_of_points_on_grid_edges(chart):
+    raster = ChartRaster.build(chart, BBOX, RESOLUTION)
+    points = [[0.0, 0.0], [3.0, 96.0], [99.0, 99.0], [100.0, 100.0],
+              [101.5, 0.0], [102.0, 0.0], [-1e-9, 0.0], [0.0, 102.0]]
+    row, column, on_grid = raster.cells(points)
+    assert on_grid.tolist() == [True] * 5 + [False] * 3
+    assert row[on_grid].tolist() == [0, 32, 33, 33, 0]
+    assert column[on_grid].tolist() == [0, 1, 33, 33, 33]
+
+
+def test_navigable_matches_the_query(chart, tmp_path):
+    raster = ChartRaster.build(chart, BBOX, RESOLUTION)
+    raster.save(tmp_path / 'chart.npz')
+    raster = ChartRaster.load(tmp_path / 'chart.npz', chart)
+    points = _edges()
+    for depth in chart.depths:
+        exact = chart.navigable(points, depth)
+        assert raster.navigable(points, depth).tolist() == exact.tolist()
+        coarse = raster.navigable(points, depth, exact=False)
+        assert not (coarse & ~exact).any() and coarse.sum() > exact.sum() / 2
+    outside = raster.navigable([[-1.0, 50.0], [50.0, 101.0], [102.0, 50.0]])
+    assert not outside.any()
@@ -0,0 +1,71 @@
+import pytest
+import yaml
+
+import simcharts.environment.environment as environment
+import simcharts.utils as utils
+
+
+class _Layers:
+    """Stands in for a group of chart layers, counting those processed."""
+
+    built = 0
+
+    def __init__(self, scope, previous=None):
+        _Layers.built += 1
+        self.labels = list(scope.layers)
+
+
+def _settings(**enc):
+    with open(utils.paths.config, encoding='utf-8') as config:
+        settings = yaml.safe_load(config)
+    settings['enc'].update(
+        files=['chart.gdb'], layers=['seabed', 'land', 'shore'],
+        snapshot=True, lazy_depths=False, tiles=False, verbose=False, **enc
+    )
+    return settings
+
+
+@pytest.fixture
+def saves(data_dir, monkeypatch):
+    """Builds stand-in layers, and returns the list of snapshot saves."""
+    monkeypatch.setattr(environment.spl, 'Hydrography', _Layers)
+    monkeypatch.setattr(environment.spl, 'Topography', _Layers)
+    monkeypatch.setattr(
+        utils.files, 'build_directory_structure', lambda features=None: None
+    )
+    _Layers.built = 0
+    saved, save = [], utils.snapshot.Snapshot.save
+
+    def spy(snapshot, objects):
+        saved.append(snapshot.file_path)
+        save(snapshot, objects)
+
+    monkeypatch.setattr(utils.snapshot.Snapshot, 'save', spy)
+    return saved
+
+
+def test_warm_start_after_new_data_restores_snapshot(saves):
+    environment.Environment(_settings(new_data=True))
+    assert _Layers.built == 2
+    for _ in range(2):
+        restored = environment.Environment(_settings(new_data=False))
+        assert _Layers.built == 2
+        assert 'seabed0m' in restored.hydrography.labels
+    assert len(list(utils.paths.snapshots.iterdir())) == 1
+
+
+def test_restored_snapshot_is_not_saved_again(saves):
+    environment.Environment(_settings(new_data=True))
+    assert len(saves) == 1
+    restored = environment.Environment(_settings(new_data=False), defer=True)
+    restored.load()
+    assert len(saves) == 1 and _Layers.built == 2
+
+
+def test_reload_saves_a_snapshot_only_after_rebuilding_layers(saves):
+    chart = environment.Environment(_settings(new_data=True))
+    assert chart.reload(_settings(path_draft=9.0), ['path_draft']) == []
+    assert len(saves) == 1
+    reloaded = chart.reload(_settings(tolerance=3), ['tolerance'])
+    assert reloaded == ['hydrography', 'topography']
+    assert len(saves) == 2 and saves[1] != saves[0]
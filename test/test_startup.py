@@ -0,0 +1,96 @@
+import importlib.util
+import json
+import subprocess
+import sys
+
+import pytest
+
+
+# Module of each console script, with its import time budget in seconds and
+# the heavy packages it must not import before they are used.
+SCRIPTS = {
+    'simcharts': (
+        'simcharts.launch_simcharts', 3.0, ['matplotlib', 'cartopy'],
+    ),
+    'local_traffic_node': (
+        'simcharts.launch_local_traffic_node', 2.0,
+        ['matplotlib', 'cartopy', 'fiona', 'pyproj'],
+    ),
+    'build_charts': (
+        'simcharts.launch_build_charts', 2.0,
+        ['matplotlib', 'cartopy', 'fiona', 'pyproj', 'rclpy'],
+    ),
+    'build_tiles': (
+        'simcharts.launch_build_tiles', 2.0,
+        ['matplotlib', 'cartopy', 'fiona', 'pyproj', 'rclpy'],
+    ),
+    'dev_test': (
+        'simcharts.devTest', 2.0,
+        ['matplotlib', 'cartopy', 'fiona', 'pyproj'],
+    ),
+}
+
+# Modules used without ROS, such as by chart tools and tests, with their
+# import time budget in seconds and the packages they must not import.
+LIBRARIES = {
+    'simcharts.environment': (
+        2.0, ['matplotlib', 'cartopy', 'fiona', 'pyproj', 'pyarrow', 'rclpy'],
+    ),
+    'simcharts.utils': (
+        1.0, ['matplotlib', 'cartopy', 'fiona', 'pyproj', 'pyarrow', 'rclpy'],
+    ),
+}
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps(dict(elapsed=elapsed, modules=sorted(sys.modules))))
+'''
+
+
+def _requirements(module):
+    """Returns the ROS packages imported by the module of a script."""
+    with open(importlib.util.find_spec(module).origin, encoding='utf-8') as f:
+        source = f.read()
+    return [name for name in ('rclpy', 'simcharts_interfaces',
+                              'simcharts_aisforwarder') if name in source]
+
+
+@pytest.mark.parametrize('script', sorted(SCRIPTS))
+def test_startup_budget(script, tmp_path):
+    module, budget, lazy = SCRIPTS[script]
+    missing = [
+        name for name in _requirements(module)
+        if importlib.util.find_spec(name) is None
+    ]
+    if missing:
+        pytest.skip(f'{script} requires ' + ', '.join(missing))
+
+    _check_import(script, module, budget, lazy, tmp_path)
+
+
+@pytest.mark.parametrize('module', sorted(LIBRARIES))
+def test_library_import_budget(module, tmp_path):
+    budget, lazy = LIBRARIES[module]
+    _check_import(module, module, budget, lazy, tmp_path)
+
+
+def _check_import(name, module, budget, lazy, tmp_path):
+    """Imports a module in a fresh interpreter, and checks its import time
+    and the heavy packages it loaded."""
+    # Runs outside the source tree, so the installed package is imported.
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module)],
+        capture_output=True, text=True, cwd=tmp_path,
+    )
+    if "No module named 'simcharts'" in result.stderr:
+        pytest.skip('simcharts is not installed')
+    assert result.returncode == 0, result.stderr
+    probe = json.loads(result.stdout.splitlines()[-1])
+    loaded = [x for x in lazy if x in probe['modules']]
+    assert not loaded, f'{name} imports {loaded} at startup'
+    assert probe['elapsed'] < budget, \
+        f"{name} took {probe['elapsed']:.2f} s to import, " \
+        f'over its budget of {budget:.1f} s'
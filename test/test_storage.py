@@ -0,0 +1,113 @@
+import pickle
+
+import pytest
+import shapely
+import yaml
+
+import simcharts.utils as utils
+from simcharts import launch_build_charts
+from simcharts.spatial import hypsometry
+from simcharts.utils.storage import ArrowStorage, ParquetStorage
+
+
+def _parts(geometry):
+    """The exact polygons of a geometry, regardless of its type."""
+    return shapely.to_wkb(shapely.get_parts(geometry)).tolist()
+
+
+def _within(read, written, tolerance):
+    """Whether two geometries have the same polygons, vertex for vertex, up
+    to the given distance."""
+    read, written = shapely.get_parts(read), shapely.get_parts(written)
+    return len(read) == len(written) and bool(
+        shapely.equals_exact(read, written, tolerance).all()
+    )
+
+
+def _unscanned(*args, **kwargs):
+    raise AssertionError('sources scanned despite cached layers')
+
+
+@pytest.mark.parametrize('compression', ['none', 'zstd'])
+@pytest.mark.parametrize('cache_format', ['arrow', 'parquet'])
+def test_columnar_layers_read_back_as_written(gdb, monkeypatch, cache_format,
+                                              compression):
+    settings = dict(cache_format=cache_format, cache_compression=compression)
+    written = gdb.load(**settings)
+    monkeypatch.setattr(hypsometry, '_scan', _unscanned)
+    read = gdb.load(new_data=False, **settings)
+    for label, geometry in written.items():
+        assert _parts(read[label]) == _parts(geometry), label
+
+
+@pytest.mark.parametrize('cache_format', ['arrow', 'parquet'])
+def test_columnar_backends_survive_pickling(gdb, cache_format):
+    written = gdb.load(cache_format=cache_format)
+    parser = gdb.scope(cache_format=cache_format, new_data=False).parser
+    storage = pickle.loads(pickle.dumps(parser.storage))
+    geometry = storage.read(parser._shapefile_path('land'))
+    assert _parts(geometry) == _parts(written['land'])
+
+
+@pytest.mark.parametrize('backend', [ArrowStorage, ParquetStorage])
+def test_compact_backends_round_trip_within_float32(tmp_path, backend):
+    x, y = 569000.0, 7034000.0
+    geometry = shapely.MultiPolygon([
+        shapely.box(x, y, x + 9000.3, y + 4000.7).difference(
+            shapely.Point(x + 5000.1, y + 2000.9).buffer(700.0)
+        ),
+        shapely.box(x + 9500.25, y + 10.5, x + 9999.75, y + 20.125),
+    ])
+    file_path = tmp_path / f'seabed{backend.suffix}'
+    backend(25833, compact=True).write(file_path, 0, geometry, (x, y))
+    read = backend(25833).read(file_path)
+    assert _within(read, geometry, utils.compact.max_error((10000, 10000)))
+    assert not _within(read, geometry, 0)
+
+
+@pytest.mark.parametrize('compression', ['none', 'zstd'])
+@pytest.mark.parametrize('cache_format', ['arrow', 'parquet'])
+def test_compact_layers_read_back_within_float32(gdb, monkeypatch,
+                                                 cache_format, compression):
+    settings = dict(
+        cache_format=cache_format, cache_compression=compression,
+        compact_coordinates=True,
+    )
+    written = gdb.load(**settings)
+    monkeypatch.setattr(hypsometry, '_scan', _unscanned)
+    read = gdb.load(new_data=False, **settings)
+    tolerance = utils.compact.max_error(gdb.settings()['enc']['size'])
+    for label, geometry in written.items():
+        assert not geometry.is_empty, label
+        assert _within(read[label], geometry, tolerance), label
+    assert not all(_within(read[k], g, 0) for k, g in written.items())
+
+
+@pytest.mark.parametrize('compact', [False, True])
+@pytest.mark.parametrize('cache_format', ['arrow', 'parquet'])
+def test_built_regions_load_from_their_caches(gdb, tmp_path, monkeypatch,
+                                              cache_format, compact):
+    settings = dict(cache_format=cache_format, compact_coordinates=compact)
+    quarter = dict(
+        origin=[gdb.origin[0] + 1000, gdb.origin[1] + 1000],
+        size=[1000.0, 1000.0], depths=[0, 10],
+    )
+    config = tmp_path / 'config.yaml'
+    config.write_text(yaml.safe_dump(gdb.settings(**settings)))
+    regions = tmp_path / 'regions.yaml'
+    regions.write_text(yaml.safe_dump({'regions': [
+        {'name': 'whole'}, {'name': 'quarter', **quarter},
+    ]}))
+    assert launch_build_charts.main([
+        str(regions), '--config', str(config), '--jobs', '2'
+    ]) == 0
+    tolerance = utils.compact.max_error([2000.0, 2000.0]) if compact else 0
+    for region in ({}, quarter):
+        with monkeypatch.context() as patch:
+            patch.setattr(hypsometry, '_scan', _unscanned)
+            read = gdb.load(new_data=False, **settings, **region)
+        built = gdb.load(**settings, **region)
+        assert sorted(read) == sorted(built)
+        for label, geometry in built.items():
+            assert not geometry.is_empty, label
+            assert _within(read[label], geometry, tolerance), label
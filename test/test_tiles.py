@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+import shapely
+import yaml
+
+import simcharts.spatial as spl
+from simcharts import launch_build_tiles
+from simcharts.spatial import hypsometry
+from simcharts.spatial.layers import Seabed
+
+BBOX = (0.0, 0.0, 1000.0, 1000.0)
+
+
+@pytest.fixture
+def pyramid(data_dir, monkeypatch):
+    """A pyramid of one tile, whose single source is a small deep pocket."""
+    pocket = shapely.Point(500, 500).buffer(8)
+    monkeypatch.setattr(
+        hypsometry, '_scan',
+        lambda parser, sources, profile, manifest=None: {
+            'seabed10m': np.array([pocket])
+        },
+    )
+    return spl.TilePyramid(['source.gdb'], 1000, [0.0, 2.0, 10.0], 5, 25833)
+
+
+def _build(pyramid):
+    layers = [(Seabed(10), spl.Hydrography.add_buffer)]
+    built = hypsometry._build_tile(layers, (0, 0), pyramid)
+    pyramid.commit(BBOX, {
+        label: {f"{level:g}": [(0, 0)] for level in levels}
+        for label, levels in built.items()
+    })
+    return built
+
+
+def test_area_vanishing_at_coarse_levels_is_kept_at_fine_ones(pyramid):
+    assert _build(pyramid) == {'seabed10m': [0.0, 2.0]}
+    pocket = shapely.Point(500, 500).buffer(8).buffer(-5)
+    for tolerance in (0, 2):
+        geometry = pyramid.assemble('seabed10m', BBOX, tolerance)
+        assert geometry.intersects(pocket.centroid)
+        assert geometry.area == pytest.approx(pocket.area, rel=0.5)
+    assert pyramid.assemble('seabed10m', BBOX, 10).is_empty
+
+
+def test_level_is_chosen_from_the_built_levels(pyramid):
+    _build(pyramid)
+    pyramid.levels = [0.0, 5.0]
+    assert pyramid.level(4) == 2.0
+    assert not pyramid.assemble('seabed10m', BBOX, 4).is_empty
+
+
+def test_key_depends_on_levels(data_dir):
+    pyramids = [
+        spl.TilePyramid(['source.gdb'], 1000, levels, 5, 25833)
+        for levels in ([0.0, 2.0, 10.0], [0.0, 5.0])
+    ]
+    assert pyramids[0].key != pyramids[1].key
+
+
+def test_key_depends_on_crs_and_format(data_dir):
+    keys = {
+        spl.TilePyramid(
+            ['source.gdb'], 1000, [0.0], 5, epsg, cache_format
+        ).key
+        for epsg, cache_format in (
+            (25832, 'shapefile'), (25833, 'shapefile'), (25832, 'arrow'),
+            (25832, 'parquet'),
+        )
+    }
+    assert len(keys) == 4
+
+
+def test_command_builds_tiles_for_its_crs_and_format(gdb, tmp_path):
+    config = tmp_path / 'config.yaml'
+    config.write_text(yaml.safe_dump(gdb.settings(tile_levels=[0.0])))
+    assert launch_build_tiles.main(['--config', str(config)]) == 0
+    tiled = gdb.load(tiles=True, tile_levels=[0.0])
+    for label, geometry in gdb.load().items():
+        assert tiled[label].symmetric_difference(geometry).area < 1e-6
+    for other in (dict(utm_zone=33), dict(cache_format='arrow')):
+        with pytest.raises(FileNotFoundError, match='No tile pyramid'):
+            gdb.load(tiles=True, tile_levels=[0.0], **other)
+
+
+def test_tiles_assemble_into_the_buffered_layer(data_dir, monkeypatch):
+    areas = [
+        shapely.Polygon([(100, 100), (1900, 100), (1900, 700),
+                         (800, 700), (800, 1800), (100, 1800)]),
+        shapely.Point(1400, 1300).buffer(300),
+    ]
+    monkeypatch.setattr(
+        hypsometry, '_scan',
+        lambda parser, sources, profile, manifest=None: {
+            'seabed10m': np.array(areas)
+        },
+    )
+    pyramid = spl.TilePyramid(['source.gdb'], 1000, [0.0], 5, 25833)
+    bbox = (0.0, 0.0, 2000.0, 2000.0)
+    layers = [(Seabed(10), spl.Hydrography.add_buffer)]
+    tiles = {}
+    for index in pyramid.indices(bbox):
+        built = hypsometry._build_tile(layers, index, pyramid)
+        for label, levels in built.items():
+            for level in levels:
+                tiles.setdefault(label, {}).setdefault(f"{level:g}", [])
+                tiles[label][f"{level:g}"].append(index)
+    pyramid.commit(bbox, tiles)
+
+    eroded = shapely.union_all(areas).buffer(-5, cap_style=2, join_style=3)
+    for window in (bbox, (300.0, 400.0, 1700.0, 1500.0)):
+        expected = shapely.box(*window).intersection(eroded)
+        geometry = pyramid.assemble('seabed10m', window, 0)
+        assert geometry.symmetric_difference(expected).area < 1e-6